@@ -38,6 +38,7 @@
 
     "data": [
         "security/ir.model.access.csv",
+        "security/land_print_job_security.xml",
         "views/assets.xml",
         "views/plot_views.xml",
         "views/menu.xml",
@@ -50,6 +51,7 @@
         "views/sale_advance_payment_inv_view.xml",
         "views/sale_commission_line_inherit.xml",
         "views/land_project_summary_views.xml",
+        "views/land_print_job_views.xml",
         # "report/sale_report.xml",
         "report/sale_user_report.xml",
         "report/report_saleorder.xml",
@@ -60,6 +62,7 @@
         "data/corn.xml",
         "data/ir_sequence_data.xml",
         "data/commission_sequence.xml",
+        "data/land_plot_data.xml",
 
     ],
 
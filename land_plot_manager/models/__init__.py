@@ -9,6 +9,13 @@ from . import customer_report
 from . import res_partner
 from . import sale_advance_payment_inv
 from . import land_project_summary
+from . import land_allotment_counter
+from . import land_mail_job
+from . import sale_order_report
+from . import land_print_job
+from . import res_currency
 
 from . import sale_commission_line_inherit
+from . import land_commission_settlement
+from . import land_commission_rate
 # from . import sale_commission_plan_ext
\ No newline at end of file
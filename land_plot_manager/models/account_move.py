@@ -87,6 +87,14 @@ class AccountMove(models.Model):
         compute="_compute_amount_in_words",
         store=True,
     )
+    challan_mail_state = fields.Selection([
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('no_email', 'No Email Address'),
+        ('cancelled', 'Not Sent (invoice no longer posted)'),
+    ], string="Challan Email", readonly=True, copy=False,
+        help="Delivery status of the invoice email with the challan attached, sent in the background after posting.")
 
     # ---------------- Payment type ----------------
     custom_method = fields.Selection([
@@ -170,7 +178,7 @@ class AccountMove(models.Model):
     def _compute_amount_in_words(self):
         for rec in self:
             try:
-                rec.amount_total_in_words = rec.currency_id.amount_to_text(rec.amount_total)
+                rec.amount_total_in_words = rec.currency_id._amount_to_text_cached(rec.amount_total)
             except Exception:
                 rec.amount_total_in_words = ""
 
@@ -201,6 +209,96 @@ class AccountMove(models.Model):
                 domain.append(('sale_id', '=', move.sale_id.id))
             move.installment_invoice_ids = self.env['account.move'].search(domain)
 
+    def init(self):
+        super().init()
+        # Serves SaleOrder._get_installment_schedule: an order's installments by due date
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS account_move_sale_installment_idx
+                ON account_move (sale_id, invoice_date_due)
+             WHERE move_type = 'out_invoice' AND custom_method = 'installment'
+        """)
+
+    # ---------------- SALE ORDER LINK ----------------
+    @api.model_create_multi
+    def create(self, vals_list):
+        moves = super().create(vals_list)
+        moves._link_sale_order()
+        return moves
+
+    def _reverse_moves(self, default_values_list=None, cancel=False):
+        reverse_moves = super()._reverse_moves(default_values_list=default_values_list, cancel=cancel)
+        for move in reverse_moves:
+            if not move.sale_id and move.reversed_entry_id.sale_id:
+                move.sale_id = move.reversed_entry_id.sale_id
+        return reverse_moves
+
+    def _link_sale_order(self):
+        """
+        Keep sale_id authoritative on customer invoices and credit notes that
+        reach their order only through their lines (standard and down payment
+        invoicing) or through invoice_origin. Invoices whose lines belong to
+        several orders keep sale_id empty; the order-side lookups
+        (SaleOrder._get_invoice_counts, _invoice_domain_all_for_self) find
+        them through their lines.
+        """
+        moves = self.filtered(lambda m: not m.sale_id and m.move_type in ('out_invoice', 'out_refund'))
+        unlinked = self.browse()
+        for move in moves:
+            orders = move.invoice_line_ids.sale_line_ids.order_id
+            if len(orders) == 1:
+                move.sale_id = orders
+            elif not orders and move.invoice_origin:
+                unlinked |= move
+        if unlinked:
+            orders = self.env['sale.order'].search([('name', 'in', unlinked.mapped('invoice_origin'))])
+            order_by_name = {}
+            for order in orders:
+                # ambiguous names (several companies) are left unlinked
+                order_by_name[order.name] = False if order.name in order_by_name else order.id
+            for move in unlinked:
+                if order_by_name.get(move.invoice_origin):
+                    move.sale_id = order_by_name[move.invoice_origin]
+
+    @api.model
+    def _backfill_sale_id(self):
+        """One-off: set sale_id on existing customer invoices and credit notes."""
+        self.env.flush_all()
+        # 1) invoice lines linked to the lines of exactly one order
+        self.env.cr.execute("""
+            UPDATE account_move am
+               SET sale_id = links.order_id
+              FROM (
+                    SELECT aml.move_id, MIN(sol.order_id) AS order_id
+                      FROM account_move_line aml
+                      JOIN sale_order_line_invoice_rel rel ON rel.invoice_line_id = aml.id
+                      JOIN sale_order_line sol ON sol.id = rel.order_line_id
+                  GROUP BY aml.move_id
+                    HAVING COUNT(DISTINCT sol.order_id) = 1
+                   ) links
+             WHERE am.id = links.move_id
+               AND am.sale_id IS NULL
+        """)
+        # 2) invoice_origin matching the name of exactly one order
+        self.env.cr.execute("""
+            UPDATE account_move am
+               SET sale_id = so.id
+              FROM sale_order so
+             WHERE am.sale_id IS NULL
+               AND am.move_type IN ('out_invoice', 'out_refund')
+               AND am.invoice_origin = so.name
+               AND (SELECT COUNT(*) FROM sale_order dup WHERE dup.name = so.name) = 1
+        """)
+        # 3) credit notes inherit the order of the invoice they reverse
+        self.env.cr.execute("""
+            UPDATE account_move am
+               SET sale_id = origin.sale_id
+              FROM account_move origin
+             WHERE am.reversed_entry_id = origin.id
+               AND am.sale_id IS NULL
+               AND origin.sale_id IS NOT NULL
+        """)
+        self.invalidate_model(['sale_id'])
+
     # ---------------- HELPERS ----------------
     def _get_total_months(self):
         self.ensure_one()
@@ -220,6 +318,10 @@ class AccountMove(models.Model):
         report = self.env.ref('land_plot_manager.challan_report_action')
         return report.report_action(self)
 
+    def action_bulk_print_challan(self):
+        """Render the challans of the selected invoices in the background, as one ZIP."""
+        return self.env['land.print.job']._enqueue('land_plot_manager.challan_report_action', self)
+
     def _send_invoice_email(self):
         """Basic invoice email (without forcing challan attachment)."""
         self.ensure_one()
@@ -368,43 +470,30 @@ class AccountMove(models.Model):
 
     # ---------------- POST + CHALLAN EMAIL ----------------
     def action_post(self):
-        """Override to send email + challan after posting invoice."""
+        """Override to queue the invoice email + challan after posting; it is sent by the mail queue worker."""
         res = super(AccountMove, self).action_post()
-        for invoice in self:
-            if invoice.move_type == 'out_invoice' and invoice.state == 'posted':
-                if not invoice.partner_id or not invoice.partner_id.email:
-                    _logger.warning(
-                        "Invoice %s: No email address for customer %s",
-                        invoice.name,
-                        invoice.partner_id and invoice.partner_id.name or 'Unknown'
-                    )
-                    continue
-                try:
-                    # Main path: send invoice email with challan attached
-                    ok = invoice.action_send_invoice_with_challan()
-                    if ok:
-                        _logger.info(
-                            "Invoice email with challan sent to %s for invoice %s",
-                            invoice.partner_id.email, invoice.name
-                        )
-                except Exception as e:
-                    _logger.exception(
-                        "Error sending invoice email with challan after posting: %s",
-                        e
-                    )
-                    # Fallback: try basic email
-                    try:
-                        if invoice._send_invoice_email():
-                            _logger.info(
-                                "Fallback invoice email sent to %s for invoice %s",
-                                invoice.partner_id.email, invoice.name
-                            )
-                    except Exception as e2:
-                        _logger.exception(
-                            "Error sending fallback invoice email: %s", e2
-                        )
+        invoices = self.filtered(lambda m: m.move_type == 'out_invoice' and m.state == 'posted')
+        no_email = invoices.filtered(lambda m: not m.partner_id.email)
+        for invoice in no_email:
+            _logger.warning(
+                "Invoice %s: No email address for customer %s",
+                invoice.name,
+                invoice.partner_id and invoice.partner_id.name or 'Unknown'
+            )
+        no_email.challan_mail_state = 'no_email'
+        to_send = invoices - no_email
+        if to_send:
+            to_send.challan_mail_state = 'queued'
+            self.env['land.mail.job']._enqueue('challan', to_send)
         return res
 
+    def action_resend_challan(self):
+        """Queue the invoice email with challan again."""
+        invoices = self.filtered(lambda m: m.move_type == 'out_invoice' and m.state == 'posted' and m.partner_id.email)
+        invoices.challan_mail_state = 'queued'
+        self.env['land.mail.job']._enqueue('challan', invoices)
+        return True
+
     def action_send_invoice_with_challan(self):
         """
         Generate Challan PDF via qweb report and send invoice email
@@ -436,65 +525,7 @@ class AccountMove(models.Model):
             return self._send_invoice_email()
 
         try:
-            # 1) Challan PDF generate (IMPORTANT: use keyword res_ids)
-            pdf_result = report._render_qweb_pdf(res_ids=self.ids)
-            try:
-                pdf_content, content_type = pdf_result
-            except ValueError:
-                pdf_content = pdf_result
-
-            if isinstance(pdf_content, str):
-                pdf_bytes = pdf_content.encode('utf-8')
-            else:
-                pdf_bytes = pdf_content
-
-            pdf_base64 = base64.b64encode(pdf_bytes).decode('ascii')
-
-            # 2) Template se email_values banao
-            email_values = template.generate_email(self.id)
-            email_values.setdefault('email_to', self.partner_id.email or False)
-
-            Mail = self.env['mail.mail'].sudo()
-            Attachment = self.env['ir.attachment'].sudo()
-
-            # 3) Pehle attachment record banao (res_model=mail.mail, res_id temporary 0)
-            attachment = Attachment.create({
-                'name': 'Challan-%s.pdf' % (self.name or self.id),
-                'type': 'binary',
-                'datas': pdf_base64,
-                'res_model': 'mail.mail',
-                'res_id': 0,
-                'mimetype': 'application/pdf',
-            })
-
-            # 4) Purane template attachments bhi preserve karo, aur naya challan add karo
-            attachment_cmds = []
-            for val in (email_values.get('attachment_ids') or []):
-                if isinstance(val, tuple):
-                    # already a command
-                    attachment_cmds.append(val)
-                else:
-                    # id -> (4, id)
-                    attachment_cmds.append((4, val))
-            attachment_cmds.append((4, attachment.id))
-            email_values['attachment_ids'] = attachment_cmds
-
-            # 5) Mail create + link attachment ka res_id + send
-            mail = Mail.create(email_values)
-            attachment.write({'res_id': mail.id})
-            mail.send()
-
-            self.message_post(
-                body=_("Challan PDF attached and email sent to %s") %
-                     (self.partner_id.email or "-"),
-                subject=_("Invoice Email with Challan Sent")
-            )
-            _logger.info(
-                "Challan attached and email sent for invoice %s to %s",
-                self.name, self.partner_id.email or "-"
-            )
-            return True
-
+            return self._send_challan_mail(template, report)
         except Exception as e:
             _logger.exception(
                 "Failed to generate/send challan for invoice %s: %s",
@@ -503,6 +534,75 @@ class AccountMove(models.Model):
             # Fallback: simple email without challan
             return self._send_invoice_email()
 
+    def _send_challan_mail(self, template=None, report=None):
+        """
+        Render the challan, attach it to the invoice email and send it now.
+        Raises when rendering or delivery fails (used by the mail queue worker).
+        """
+        self.ensure_one()
+        template = template or self.env.ref('land_plot_manager.email_template_invoice_created')
+        report = report or self.env.ref('land_plot_manager.challan_report_action')
+
+        # 1) Challan PDF generate (IMPORTANT: use keyword res_ids)
+        pdf_result = report._render_qweb_pdf(report.report_name, res_ids=self.ids)
+        try:
+            pdf_content, content_type = pdf_result
+        except ValueError:
+            pdf_content = pdf_result
+
+        if isinstance(pdf_content, str):
+            pdf_bytes = pdf_content.encode('utf-8')
+        else:
+            pdf_bytes = pdf_content
+
+        # 2) Template se email_values banao
+        email_values = template.generate_email(self.id)
+        email_values.setdefault('email_to', self.partner_id.email or False)
+
+        Mail = self.env['mail.mail'].sudo()
+        Attachment = self.env['ir.attachment'].sudo()
+
+        # 3) Pehle attachment record banao (res_model=mail.mail, res_id temporary 0)
+        attachment = Attachment.create({
+            'name': 'Challan-%s.pdf' % (self.name or self.id),
+            'type': 'binary',
+            'datas': base64.b64encode(pdf_bytes).decode('ascii'),
+            'res_model': 'mail.mail',
+            'res_id': 0,
+            'mimetype': 'application/pdf',
+        })
+
+        # 4) Purane template attachments bhi preserve karo, aur naya challan add karo
+        attachment_cmds = []
+        for val in (email_values.get('attachment_ids') or []):
+            if isinstance(val, tuple):
+                # already a command
+                attachment_cmds.append(val)
+            else:
+                # id -> (4, id)
+                attachment_cmds.append((4, val))
+        attachment_cmds.append((4, attachment.id))
+        email_values['attachment_ids'] = attachment_cmds
+
+        # 5) Mail create + link attachment ka res_id + send
+        mail = Mail.create(email_values)
+        attachment.write({'res_id': mail.id})
+        mail.send(raise_exception=True)
+        mail = mail.exists()
+        if mail and mail.state == 'exception':
+            raise UserError(mail.failure_reason or _("Mail delivery failed."))
+
+        self.message_post(
+            body=_("Challan PDF attached and email sent to %s") %
+                 (self.partner_id.email or "-"),
+            subject=_("Invoice Email with Challan Sent")
+        )
+        _logger.info(
+            "Challan attached and email sent for invoice %s to %s",
+            self.name, self.partner_id.email or "-"
+        )
+        return True
+
 
 # ---------------- Account Move Line ----------------
 class AccountMoveLine(models.Model):
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Allotment Counter
+Per-prefix counters handing out sale order allotment numbers
+"""
+from odoo import api, fields, models
+
+
+class LandAllotmentCounter(models.Model):
+    """
+    One row per allotment prefix (the first product name of the order).
+    Numbers are allocated with a single upsert instead of counting the
+    existing allotment numbers of the prefix.
+    """
+    _name = 'land.allotment.counter'
+    _description = 'Allotment Number Counter'
+    _rec_name = 'prefix'
+
+    prefix = fields.Char(string="Prefix", required=True, readonly=True)
+    last_number = fields.Integer(string="Last Number", readonly=True)
+
+    def init(self):
+        # Required by the ON CONFLICT (prefix) upserts below
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS land_allotment_counter_prefix_uniq
+                ON land_allotment_counter (prefix)
+        """)
+
+    @api.model
+    def _next_number(self, prefix):
+        """
+        Increment and return the counter of a prefix in one statement.
+        The upsert keeps the counter row locked until the transaction ends,
+        so concurrent confirmations are serialized per prefix and never
+        receive the same number.
+        """
+        self.env.cr.execute("""
+            INSERT INTO land_allotment_counter (prefix, last_number, create_uid, create_date, write_uid, write_date)
+                 VALUES (%(prefix)s, 1, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (prefix) DO UPDATE
+                    SET last_number = land_allotment_counter.last_number + 1,
+                        write_uid = EXCLUDED.write_uid,
+                        write_date = EXCLUDED.write_date
+              RETURNING last_number
+        """, {'prefix': prefix, 'uid': self.env.uid})
+        number = self.env.cr.fetchone()[0]
+        self.invalidate_model(['last_number'])
+        return number
+
+    @api.model
+    def _backfill_from_sale_orders(self):
+        """Seed the counters from the allotment numbers (PREFIX-###) already given out."""
+        self.env['sale.order'].flush_model(['allotment_no'])
+        self.env.cr.execute("""
+            INSERT INTO land_allotment_counter (prefix, last_number, create_uid, create_date, write_uid, write_date)
+                 SELECT substring(allotment_no FROM '^(.+)-[0-9]{1,9}$'),
+                        MAX(substring(allotment_no FROM '-([0-9]{1,9})$')::integer),
+                        %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+                   FROM sale_order
+                  WHERE allotment_no ~ '^.+-[0-9]{1,9}$'
+               GROUP BY 1
+            ON CONFLICT (prefix) DO UPDATE
+                    SET last_number = GREATEST(land_allotment_counter.last_number, EXCLUDED.last_number)
+        """, {'uid': self.env.uid})
+        self.invalidate_model(['last_number'])
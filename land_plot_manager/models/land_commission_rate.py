@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Commission Rates
+Effective-dated commission rates per plot category
+"""
+import logging
+
+from odoo import api, fields, models, tools, _
+from odoo.exceptions import ValidationError
+
+_logger = logging.getLogger(__name__)
+
+COMMISSION_CATEGORIES = [
+    ('r5', 'Residential 5 Marla'),
+    ('r10', 'Residential 10 Marla'),
+    ('c4', 'Commercial 4 Marla'),
+    ('c8', 'Commercial 8 Marla'),
+]
+
+
+class LandCommissionRate(models.Model):
+    """
+    Commission rate of a category from its effective date until the next
+    rate of the same category. Read through a process-level cache
+    (_get_rate_table) that is cleared whenever a rate changes; a change
+    recomputes the commissions of the affected category and period in SQL.
+    """
+    _name = 'land.commission.rate'
+    _description = 'Land Commission Rate'
+    _order = 'commission_category, date_from desc'
+
+    commission_category = fields.Selection(COMMISSION_CATEGORIES, string="Commission Category", required=True)
+    date_from = fields.Date(string="Effective From", required=True, default=fields.Date.context_today)
+    extra_amount = fields.Float(string="Padding Amount", required=True)
+    commission_1 = fields.Float(string="Fixed Padding Commission", required=True)
+    rate = fields.Float(string="Variable Rate", required=True, default=0.05,
+                        help="Share of the sale price above the padding amount, e.g. 0.05 for 5%.")
+
+    _sql_constraints = [
+        ('category_date_uniq', 'unique(commission_category, date_from)',
+         'Only one commission rate per category can start on a given date.'),
+    ]
+
+    @api.constrains('rate', 'extra_amount', 'commission_1')
+    def _check_values(self):
+        for rec in self:
+            if rec.rate < 0 or rec.extra_amount < 0 or rec.commission_1 < 0:
+                raise ValidationError(_("Commission rates and amounts cannot be negative."))
+
+    # -------------------------------------------------------------------------
+    # Cached lookup
+    # -------------------------------------------------------------------------
+    @api.model
+    @tools.ormcache()
+    def _get_rate_table(self):
+        """
+        {category: ((date_from, extra_amount, commission_1, rate), ...)} sorted by date.
+        The first entry of each category (date None) holds the built-in defaults
+        of land.plot.commission, used before the first effective rate.
+        """
+        Commission = self.env['land.plot.commission']
+        table = {
+            category: [(None, data['extra_amount'], data['commission_1'], Commission.COMMISSION_RATE)]
+            for category, data in Commission.COMMISSION_CATEGORY_MAP.items()
+        }
+        for rate in self.sudo().search_read(
+                [], ['commission_category', 'date_from', 'extra_amount', 'commission_1', 'rate'],
+                order='commission_category, date_from'):
+            table.setdefault(rate['commission_category'], []).append(
+                (rate['date_from'], rate['extra_amount'], rate['commission_1'], rate['rate']))
+        return {category: tuple(rates) for category, rates in table.items()}
+
+    @api.model
+    def _get_rate_values(self, category, date=None):
+        """(extra_amount, commission_1, rate) of the category effective on the date (today if unset)."""
+        date = date or fields.Date.context_today(self)
+        values = None
+        for date_from, extra_amount, commission_1, rate in self._get_rate_table().get(category, ()):
+            if date_from is not None and date_from > date:
+                break
+            values = (extra_amount, commission_1, rate)
+        return values
+
+    # -------------------------------------------------------------------------
+    # Invalidation and recompute
+    # -------------------------------------------------------------------------
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._rates_changed(records._get_change_points())
+        return records
+
+    def write(self, vals):
+        points = self._get_change_points()
+        res = super().write(vals)
+        self._rates_changed(points | self._get_change_points())
+        return res
+
+    def unlink(self):
+        points = self._get_change_points()
+        res = super().unlink()
+        self._rates_changed(points)
+        return res
+
+    def _get_change_points(self):
+        return {(rec.commission_category, rec.date_from) for rec in self}
+
+    @api.model
+    def _rates_changed(self, points):
+        self.env.flush_all()
+        self.env.registry.clear_cache()
+        by_category = {}
+        for category, date_from in points:
+            by_category.setdefault(category, []).append(date_from)
+        for category, dates in by_category.items():
+            self._recompute_commissions(category, min(dates), max(dates))
+
+    @api.model
+    def _recompute_commissions(self, category, date_from, last_changed):
+        """
+        Reprice the commissions of the category dated from date_from until the
+        rate following last_changed takes over: one UPDATE per rate period.
+        Unsettled commissions get the new amounts; commissions already billed
+        keep theirs and are flagged with rate_outdated when they differ.
+        """
+        rates = self._get_rate_table().get(category, ())
+        date_to = next((d for d, *_values in rates if d is not None and d > last_changed), None)
+        cr = self.env.cr
+        updated = flagged = 0
+        for index, (start, extra_amount, commission_1, rate) in enumerate(rates):
+            end = rates[index + 1][0] if index + 1 < len(rates) else None
+            # clamp the rate period to the affected range
+            if start is None or start < date_from:
+                start = date_from
+            if date_to and (end is None or end > date_to):
+                end = date_to
+            if end is not None and end <= start:
+                continue
+            params = {
+                "category": category,
+                "start": start,
+                "end": end,
+                "extra": extra_amount,
+                "commission_1": commission_1,
+                "rate": rate,
+            }
+            period = """
+                commission_category = %(category)s
+                AND COALESCE(commission_date, create_date::date) >= %(start)s
+                AND (%(end)s::date IS NULL OR COALESCE(commission_date, create_date::date) < %(end)s)
+            """
+            cr.execute("""
+                UPDATE land_plot_commission
+                   SET extra_amount = %(extra)s,
+                       variable_commission_base = GREATEST(COALESCE(sale_price, 0) - %(extra)s, 0),
+                       commission_1 = %(commission_1)s,
+                       commission_2 = ROUND((GREATEST(COALESCE(sale_price, 0) - %(extra)s, 0) * %(rate)s)::numeric, 2),
+                       commission_total = %(commission_1)s
+                           + ROUND((GREATEST(COALESCE(sale_price, 0) - %(extra)s, 0) * %(rate)s)::numeric, 2),
+                       rate_outdated = FALSE
+                 WHERE commission_invoice_id IS NULL AND """ + period, params)
+            updated += cr.rowcount
+            cr.execute("""
+                UPDATE land_plot_commission
+                   SET rate_outdated = TRUE
+                 WHERE commission_invoice_id IS NOT NULL
+                   AND commission_total IS DISTINCT FROM %(commission_1)s
+                       + ROUND((GREATEST(COALESCE(sale_price, 0) - %(extra)s, 0) * %(rate)s)::numeric, 2)
+                   AND """ + period, params)
+            flagged += cr.rowcount
+
+        self.env['land.plot.commission'].invalidate_model([
+            'extra_amount', 'variable_commission_base', 'commission_1',
+            'commission_2', 'commission_total', 'rate_outdated',
+        ])
+        if updated or flagged:
+            _logger.info("Commission rates %s from %s: %s commissions repriced, %s billed commissions flagged",
+                         category, date_from, updated, flagged)
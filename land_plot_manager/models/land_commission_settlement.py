@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Commission Settlement
+Periodic consolidated vendor bills for land plot commissions
+"""
+import logging
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models, _
+
+_logger = logging.getLogger(__name__)
+
+
+class LandCommissionSettlement(models.Model):
+    """
+    One settlement bill: all unsettled commissions of a partner in one
+    currency for a period, billed as a single vendor bill with one line
+    per commission.
+    """
+    _name = 'land.commission.settlement'
+    _description = 'Commission Settlement'
+    _order = 'date_to desc, id desc'
+
+    name = fields.Char(default=lambda self: _('New'), readonly=True, copy=False)
+    date_from = fields.Date(string="From", readonly=True)
+    date_to = fields.Date(string="To", readonly=True)
+    partner_id = fields.Many2one('res.partner', string="Commission Partner", required=True, readonly=True)
+    currency_id = fields.Many2one('res.currency', required=True, readonly=True)
+    commission_ids = fields.One2many('land.plot.commission', 'settlement_id', string="Commissions", readonly=True)
+    commission_count = fields.Integer(string="Commissions", readonly=True)
+    amount_total = fields.Monetary(string="Total Commission", currency_field='currency_id', readonly=True)
+    bill_id = fields.Many2one('account.move', string="Vendor Bill", readonly=True, copy=False)
+    bill_state = fields.Selection(related='bill_id.state', string="Bill Status")
+
+    # -------------------------------------------------------------------------
+    # Engine
+    # -------------------------------------------------------------------------
+    @api.model
+    def _get_unsettled_domain(self, date_from=None, date_to=None):
+        domain = [('commission_invoice_id', '=', False), ('commission_total', '>', 0)]
+        if date_from:
+            domain.append(('commission_date', '>=', date_from))
+        if date_to:
+            domain.append(('commission_date', '<=', date_to))
+        return domain
+
+    @api.model
+    def _settle(self, commissions, date_from=None, date_to=None):
+        """
+        Bill the given commissions: one settlement and one vendor bill per
+        (partner, currency), created with one multi-create each, then the
+        commissions of every group are linked with one write.
+        """
+        commissions = commissions.filtered(lambda c: not c.commission_invoice_id and c.commission_total > 0)
+        if not commissions:
+            return self.browse()
+
+        group_ids = {}
+        for commission in commissions:
+            partner = commission.commission_partner_id or self.env.company.partner_id
+            group_ids.setdefault((partner.id, commission.currency_id.id), []).append(commission.id)
+        groups = {key: commissions.browse(ids) for key, ids in group_ids.items()}
+
+        product = self.env['land.plot.commission']._get_commission_product()
+        bill_vals_list = []
+        settlement_vals_list = []
+        for (partner_id, currency_id), group in groups.items():
+            settlement_vals_list.append({
+                'name': self.env['ir.sequence'].next_by_code('land.commission.settlement') or _('New'),
+                # open-ended runs record the oldest commission actually billed
+                'date_from': date_from or min(group.mapped('commission_date'), default=False),
+                'date_to': date_to,
+                'partner_id': partner_id,
+                'currency_id': currency_id,
+                'commission_count': len(group),
+                'amount_total': sum(group.mapped('commission_total')),
+            })
+            bill_vals_list.append({
+                'move_type': 'in_invoice',
+                'partner_id': partner_id,
+                'currency_id': currency_id,
+                'invoice_origin': settlement_vals_list[-1]['name'],
+                'invoice_line_ids': [(0, 0, {
+                    'name': "%s - %s" % (product.name, commission.origin or commission.name),
+                    'product_id': product.id,
+                    'quantity': 1.0,
+                    'price_unit': commission.commission_total,
+                }) for commission in group],
+            })
+
+        bills = self.env['account.move'].create(bill_vals_list)
+        for vals, bill in zip(settlement_vals_list, bills):
+            vals['bill_id'] = bill.id
+        settlements = self.create(settlement_vals_list)
+
+        for group, settlement in zip(groups.values(), settlements):
+            group.write({'settlement_id': settlement.id, 'commission_invoice_id': settlement.bill_id.id})
+
+        _logger.info("Commission settlement: %s commissions billed on %s bills", len(commissions), len(bills))
+        return settlements
+
+    @api.model
+    def _settle_period(self, date_from, date_to):
+        """Settle every unsettled commission dated in [date_from, date_to]; no date_from means no lower bound."""
+        commissions = self.env['land.plot.commission'].search(self._get_unsettled_domain(date_from, date_to))
+        return self._settle(commissions, date_from, date_to)
+
+    @api.model
+    def _cron_settle_commissions(self):
+        """
+        Monthly run: settle every unsettled commission dated up to the end of
+        the previous month (settlement billing mode only), so months missed by
+        the cron or commissions older than the switch to settlement mode are
+        billed too.
+        """
+        if self.env['land.plot.commission']._get_billing_mode() != 'settlement':
+            return
+        date_to = fields.Date.context_today(self).replace(day=1) - relativedelta(days=1)
+        self._settle_period(None, date_to)
+
+    # -------------------------------------------------------------------------
+    # Actions
+    # -------------------------------------------------------------------------
+    def _get_action(self):
+        action = {
+            'type': 'ir.actions.act_window',
+            'name': _("Commission Settlements"),
+            'res_model': self._name,
+            'view_mode': 'list,form',
+            'domain': [('id', 'in', self.ids)],
+            'target': 'current',
+        }
+        if len(self) == 1:
+            action.update(view_mode='form', res_id=self.id)
+        return action
+
+    def action_post_bills(self):
+        self.bill_id.filtered(lambda m: m.state == 'draft').action_post()
+        return True
+
+    def action_open_bill(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'account.move',
+            'res_id': self.bill_id.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
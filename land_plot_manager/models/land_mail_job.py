@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Land Mail Queue
+Mails rendered and sent by a cron worker instead of the user's transaction
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class LandMailJob(models.Model):
+    """
+    One queued mail. The worker (_cron_process_mail_jobs) sends jobs in
+    batches; a failing job is retried with exponential backoff and marked
+    failed after MAX_ATTEMPTS. A sender returns False when there is nothing
+    to send any more, which cancels the job.
+    """
+    _name = 'land.mail.job'
+    _description = 'Queued Land Mail'
+    _order = 'next_attempt, id'
+
+    MAX_ATTEMPTS = 5
+    BATCH_SIZE = 50
+
+    kind = fields.Selection([
+        ('sale_confirmation', 'Sale Order Confirmation'),
+        ('challan', 'Invoice Email with Challan'),
+    ], string="Kind", required=True, readonly=True)
+    res_model = fields.Char(string="Model", required=True, readonly=True)
+    res_id = fields.Many2oneReference(string="Record", model_field='res_model', required=True, readonly=True)
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ], string="Status", default='queued', required=True, index=True, readonly=True)
+    attempts = fields.Integer(string="Attempts", readonly=True)
+    next_attempt = fields.Datetime(string="Next Attempt", default=fields.Datetime.now, readonly=True)
+    sent_date = fields.Datetime(string="Sent On", readonly=True)
+    last_error = fields.Text(string="Last Error", readonly=True)
+
+    # -------------------------------------------------------------------------
+    # Queue
+    # -------------------------------------------------------------------------
+    @api.model
+    def _enqueue(self, kind, records):
+        """Queue one mail of this kind per record and wake the worker up."""
+        if not records:
+            return self.browse()
+        jobs = self.sudo().create([{
+            'kind': kind,
+            'res_model': records._name,
+            'res_id': record.id,
+        } for record in records])
+        self.env.ref('land_plot_manager.ir_cron_process_mail_jobs')._trigger()
+        return jobs
+
+    @api.model
+    def _cron_process_mail_jobs(self):
+        now = fields.Datetime.now()
+        jobs = self.search([('state', '=', 'queued'), ('next_attempt', '<=', now)], limit=self.BATCH_SIZE)
+        for job in jobs:
+            try:
+                with self.env.cr.savepoint():
+                    sent = getattr(job, '_send_%s' % job.kind)()
+                if sent:
+                    job.write({'state': 'sent', 'sent_date': fields.Datetime.now(), 'last_error': False})
+                else:
+                    # nothing to send any more (record gone, no email, ...)
+                    job.write({'state': 'cancelled'})
+            except Exception as e:
+                _logger.warning("Mail job %s (%s %s,%s) failed: %s", job.id, job.kind, job.res_model, job.res_id, e)
+                job._schedule_retry(str(e))
+            if not getattr(threading.current_thread(), 'testing', False):
+                self.env.cr.commit()
+
+        # wake up again for the next batch or the next retry
+        cron = self.env.ref('land_plot_manager.ir_cron_process_mail_jobs')
+        if len(jobs) == self.BATCH_SIZE:
+            cron._trigger()
+        else:
+            pending = self.search([('state', '=', 'queued')], order='next_attempt', limit=1)
+            if pending:
+                cron._trigger(at=pending.next_attempt)
+
+    def _schedule_retry(self, error):
+        self.ensure_one()
+        attempts = self.attempts + 1
+        vals = {'attempts': attempts, 'last_error': error}
+        if attempts >= self.MAX_ATTEMPTS:
+            vals['state'] = 'failed'
+            failed_hook = getattr(self, '_failed_%s' % self.kind, None)
+            if failed_hook:
+                failed_hook()
+        else:
+            # 2, 4, 8, 16 minutes
+            vals['next_attempt'] = fields.Datetime.now() + timedelta(minutes=2 ** attempts)
+        self.write(vals)
+
+    def _send_template_mail(self, template, record):
+        """Render the template for the record and send it right away, raising on delivery failure."""
+        mail = self.env['mail.mail'].sudo().browse(template.send_mail(record.id))
+        mail.send(raise_exception=True)
+        mail = mail.exists()
+        if mail and mail.state == 'exception':
+            raise UserError(mail.failure_reason or _("Mail delivery failed."))
+
+    # -------------------------------------------------------------------------
+    # Senders
+    # -------------------------------------------------------------------------
+    def _send_sale_confirmation(self):
+        order = self.env['sale.order'].browse(self.res_id).exists()
+        if not order or not order.partner_id.email:
+            return False
+        template = self.env.ref('land_plot_manager.email_template_sale_order_confirmed', raise_if_not_found=False)
+        if not template:
+            return False
+        self._send_template_mail(template, order)
+        order.message_post(
+            body=_("Confirmation email sent to %s - Your request has been approved") % order.partner_id.email,
+            subject=_("Sale Order Confirmed")
+        )
+        _logger.info("Confirmation email sent to %s for sale order %s", order.partner_id.email, order.name)
+        return True
+
+    def _send_challan(self):
+        invoice = self.env['account.move'].browse(self.res_id).exists()
+        if not invoice:
+            return False
+        if invoice.state != 'posted':
+            invoice.challan_mail_state = 'cancelled'
+            return False
+        if not invoice.partner_id.email:
+            invoice.challan_mail_state = 'no_email'
+            return False
+        invoice._send_challan_mail()
+        invoice.challan_mail_state = 'sent'
+        return True
+
+    def _failed_challan(self):
+        invoice = self.env['account.move'].browse(self.res_id).exists()
+        if invoice:
+            invoice.challan_mail_state = 'failed'
+            invoice.message_post(body=_("Invoice email with challan could not be sent: %s") % (self.last_error or ''))
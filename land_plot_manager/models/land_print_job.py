@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk PDF Print Jobs
+Renders a report for many records in the background and stores the PDFs in one ZIP
+"""
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools.safe_eval import safe_eval
+
+_logger = logging.getLogger(__name__)
+
+
+def _render_documents(env, report_name, model, print_report_name, res_ids):
+    """Render one PDF per record of the chunk within the given environment: [(filename, pdf)]."""
+    Report = env["ir.actions.report"]
+    documents = []
+    for record in env[model].browse(res_ids).exists():
+        pdf, _report_type = Report._render_qweb_pdf(report_name, res_ids=record.ids)
+        documents.append((_document_filename(print_report_name, record), pdf))
+    return documents
+
+
+def _document_filename(print_report_name, record):
+    name = False
+    if print_report_name:
+        name = safe_eval(print_report_name, {"object": record, "time": time})
+    name = re.sub(r"[^\w\-]+", "_", name or record.display_name or str(record.id))
+    return "%s.pdf" % name
+
+
+class LandPrintJob(models.Model):
+    """
+    One bulk print request. The records are split into chunks which are
+    rendered concurrently, each worker thread on its own cursor driving its
+    own wkhtmltopdf process, and every PDF is written to a ZIP file as soon
+    as its chunk is done.
+    """
+    _name = "land.print.job"
+    _description = "Bulk PDF Print Job"
+    _order = "create_date desc, id desc"
+
+    name = fields.Char(required=True, readonly=True)
+    report_id = fields.Many2one("ir.actions.report", string="Report", required=True, readonly=True, ondelete="cascade")
+    res_model = fields.Char(related="report_id.model", string="Model")
+    res_ids = fields.Text(string="Record IDs", required=True, readonly=True)
+    chunk_size = fields.Integer(string="Chunk Size", default=10)
+    state = fields.Selection([
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ], default="queued", required=True, readonly=True, index=True)
+    total = fields.Integer(string="Documents", readonly=True)
+    done = fields.Integer(string="Rendered", readonly=True)
+    progress = fields.Float(string="Progress (%)", compute="_compute_progress")
+    error = fields.Text(string="Error", readonly=True)
+    attachment_id = fields.Many2one("ir.attachment", string="ZIP File", readonly=True, copy=False)
+
+    @api.depends("total", "done")
+    def _compute_progress(self):
+        for job in self:
+            job.progress = (job.done * 100.0 / job.total) if job.total else 0.0
+
+    # -------------------------------------------------------------------------
+    # Queue
+    # -------------------------------------------------------------------------
+    @api.model
+    def _enqueue(self, report_ref, records):
+        """Create a print job for the records and wake up the worker; returns an action opening the job."""
+        if not records:
+            raise UserError(_("Select at least one record to print."))
+        report = self.env.ref(report_ref)
+        job = self.create({
+            "name": _("%s (%s documents)") % (report.name, len(records)),
+            "report_id": report.id,
+            "res_ids": ",".join(str(rid) for rid in records.ids),
+            "total": len(records),
+        })
+        self.env.ref("land_plot_manager.ir_cron_process_print_jobs")._trigger()
+        return {
+            "type": "ir.actions.act_window",
+            "res_model": self._name,
+            "res_id": job.id,
+            "view_mode": "form",
+            "target": "current",
+        }
+
+    def _get_record_ids(self):
+        self.ensure_one()
+        return [int(rid) for rid in self.res_ids.split(",") if rid]
+
+    @api.model
+    def _cron_process_print_jobs(self):
+        for job in self.search([("state", "=", "queued")], order="id"):
+            job._run()
+
+    @api.model
+    def _get_worker_count(self):
+        configured = int(self.env["ir.config_parameter"].sudo().get_param("land_plot_manager.print_workers", 0))
+        return configured or max(1, (os.cpu_count() or 2) - 1)
+
+    def _commit_progress(self):
+        if not getattr(threading.current_thread(), "testing", False):
+            self.env.cr.commit()
+
+    # -------------------------------------------------------------------------
+    # Rendering
+    # -------------------------------------------------------------------------
+    def _run(self):
+        self.ensure_one()
+        self.write({"state": "running", "done": 0, "error": False})
+        self._commit_progress()
+
+        started = time.perf_counter()
+        ids = self._get_record_ids()
+        size = max(self.chunk_size, 1)
+        chunks = [ids[i:i + size] for i in range(0, len(ids), size)]
+        names = set()
+        try:
+            with tempfile.TemporaryFile() as tmp:
+                with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as archive:
+                    for documents in self._render_chunks(chunks):
+                        for filename, pdf in documents:
+                            archive.writestr(self._unique_filename(filename, names), pdf)
+                        self.done += len(documents)
+                        self._commit_progress()
+                tmp.seek(0)
+                attachment = self.env["ir.attachment"].create({
+                    "name": "%s.zip" % re.sub(r"[^\w\-]+", "_", self.report_id.name),
+                    "raw": tmp.read(),
+                    "mimetype": "application/zip",
+                    "res_model": self._name,
+                    "res_id": self.id,
+                })
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.exception("Print job %s failed", self.id)
+            self.write({"state": "failed", "error": str(e)})
+            self._commit_progress()
+            return False
+
+        self.write({"state": "done", "attachment_id": attachment.id})
+        _logger.info("Print job %s: %s documents in %.1fs", self.id, self.done, time.perf_counter() - started)
+        self._commit_progress()
+        return True
+
+    def _render_chunks(self, chunks):
+        """
+        Yield the (filename, pdf) list of every chunk as soon as it is rendered.
+        Documents are rendered as the user who requested the job, not the cron user.
+        """
+        # plain values only: worker threads never touch this job's env or cursor
+        report_name = self.report_id.report_name
+        model = self.report_id.model
+        print_report_name = self.report_id.print_report_name or False
+
+        if getattr(threading.current_thread(), "testing", False) or len(chunks) == 1:
+            # test cursors cannot be shared with worker threads
+            for chunk in chunks:
+                yield _render_documents(self.with_user(self.create_uid).env,
+                                        report_name, model, print_report_name, chunk)
+            return
+
+        registry, uid, context = self.env.registry, self.create_uid.id, dict(self.env.context)
+
+        def render(chunk):
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                return _render_documents(env, report_name, model, print_report_name, chunk)
+
+        with ThreadPoolExecutor(max_workers=self._get_worker_count()) as executor:
+            futures = [executor.submit(render, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    @api.model
+    def _unique_filename(self, filename, names):
+        base, ext = os.path.splitext(filename)
+        candidate, index = filename, 1
+        while candidate in names:
+            index += 1
+            candidate = "%s_%s%s" % (base, index, ext)
+        names.add(candidate)
+        return candidate
+
+    # -------------------------------------------------------------------------
+    # Actions
+    # -------------------------------------------------------------------------
+    def action_download(self):
+        self.ensure_one()
+        if not self.attachment_id:
+            raise UserError(_("The ZIP file is not ready yet."))
+        return {
+            "type": "ir.actions.act_url",
+            "url": "/web/content/%s?download=true" % self.attachment_id.id,
+            "target": "self",
+        }
+
+    def action_retry(self):
+        self.filtered(lambda j: j.state == "failed").write({"state": "queued", "done": 0})
+        self.env.ref("land_plot_manager.ir_cron_process_print_jobs")._trigger()
+        return True
+
+    def get_progress(self):
+        """Lightweight progress payload polled by the UI while the job runs."""
+        return [{
+            "id": job.id,
+            "state": job.state,
+            "done": job.done,
+            "total": job.total,
+            "progress": job.progress,
+            "error": job.error or False,
+        } for job in self]
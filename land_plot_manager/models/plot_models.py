@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
+import logging
 import math
+import threading
+import time
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, _, Command
 from odoo.exceptions import UserError
 
+_logger = logging.getLogger(__name__)
+
 # ==================== CONSTANTS ====================
 ACRE_TO_MARLA = 37.5
 FIVE_MARLA = 5.0
@@ -11,6 +16,67 @@ TEN_MARLA = 10.0
 FOUR_MARLA_C = 4.0
 EIGHT_MARLA_C = 8.0
 
+# Plot categories in generation order, with their size and name prefix
+PLOT_CATEGORIES = ("r10", "r5", "c8", "c4")
+PLOT_CATEGORY_SELECTION = [
+    ("r10", "Residential 10 Marla"),
+    ("r5", "Residential 5 Marla"),
+    ("c8", "Commercial 8 Marla"),
+    ("c4", "Commercial 4 Marla"),
+    ("sec", "Security"),
+]
+PLOT_SIZE_MAP = {
+    "r10": TEN_MARLA,
+    "r5": FIVE_MARLA,
+    "c8": EIGHT_MARLA_C,
+    "c4": FOUR_MARLA_C,
+}
+PLOT_CODE_MAP = {
+    "r10": "RES_10",
+    "r5": "RES_5",
+    "c8": "COM_8",
+    "c4": "COM_4",
+}
+
+# Product categories used when converting plots to inventory
+INVENTORY_CATEGORY_MAP = {
+    "r10": "Residential 10 Marla",
+    "r5": "Residential 5 Marla",
+    "c8": "Commercial 8 Marla",
+    "c4": "Commercial 4 Marla",
+    "sec": "Security",
+}
+SECURITY_CATEGORY_NAME = "Security Charge"
+
+# (label, plot field, plot filename field, project field, project filename field)
+DOCUMENT_FIELDS = [
+    ("Registry", "registry_attachment", "registry_filename",
+     "registry_attachment_project", "registry_filename_project"),
+    ("Fard", "fard_attachment", "fard_filename",
+     "fard_attachment_project", "fard_filename_project"),
+    ("Intiqal", "intiqal_attachment", "intiqal_filename",
+     "intiqal_attachment_project", "intiqal_filename_project"),
+]
+
+PLOT_PREMIUM_MAP = {
+    "r10": 1.0,
+    "r5": 1.0,
+    "c8": 1.2,
+    "c4": 1.2,
+}
+
+# land.project fields that change cost_per_marla and therefore every plot price
+PLOT_COST_FIELDS = {
+    "total_acres", "land_base_cost", "registry_fee", "fard_fee", "land_price",
+    "intiqal_fee", "purchase_tax", "commission_amount", "other_fee",
+}
+
+# land.plot fields that change the used marla of a project
+MARLA_TRACKED_FIELDS = {"size_marla", "is_security", "active", "project_id"}
+
+# Rows per multi-row INSERT when generating plots
+PLOT_CREATE_BATCH = 1000
+
 
 class LandProject(models.Model):
     _name = "land.project"
@@ -22,6 +88,8 @@ class LandProject(models.Model):
     name = fields.Char(required=True, default=lambda self: _("New Project"), tracking=True)
     total_acres = fields.Float(string="Total Acres", required=True, tracking=True)
     total_marla = fields.Float(string="Total Marla", compute="_compute_totals", store=True)
+    # maintained incrementally by land.plot create/write/unlink, see LandPlot._apply_used_marla_delta
+    used_marla = fields.Float(string="Used (Marla)", readonly=True, copy=False)
     remaining_marla = fields.Float(string="Remaining (Marla)", compute="_compute_remaining_marla", store=True)
 
     project_type = fields.Selection([
@@ -79,6 +147,12 @@ class LandProject(models.Model):
 
     # Plots
     plot_ids = fields.One2many("land.plot", "project_id", string="All Plots")
+    security_pairing = fields.Selection([
+        ("first", "First Normal Plot"),
+        ("same_number", "Same Number Normal Plot"),
+        ("round_robin", "Round-Robin"),
+    ], string="Security Plot Pairing", default="first", required=True,
+        help="How security plots are linked to the normal plot of their category.")
 
     # ---------------- Project-level attachments (binary fields storing base64 content) ----------------
     # Project-level documents
@@ -97,6 +171,23 @@ class LandProject(models.Model):
     # Optional supplier for the created purchase order
     supplier_id = fields.Many2one("res.partner", string="Preferred Supplier")
 
+    # ---------------- Inventory conversion job ----------------
+    conversion_state = fields.Selection([
+        ("idle", "Not Started"),
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ], string="Conversion Status", default="idle", readonly=True, copy=False)
+    conversion_chunk_size = fields.Integer(string="Conversion Chunk Size", default=200,
+                                           help="Plots converted (and committed) per step of the conversion job.")
+    conversion_total = fields.Integer(string="Plots to Convert", readonly=True, copy=False)
+    conversion_done = fields.Integer(string="Plots Converted", readonly=True, copy=False)
+    conversion_progress = fields.Float(string="Conversion Progress (%)", compute="_compute_conversion_progress")
+    conversion_error = fields.Text(string="Conversion Error", readonly=True, copy=False)
+    conversion_purchase_id = fields.Many2one("purchase.order", string="Conversion Purchase Order",
+                                             readonly=True, copy=False)
+
     # ---------------- Computed Fields ----------------
     @api.depends("total_acres")
     def _compute_totals(self):
@@ -112,11 +203,93 @@ class LandProject(models.Model):
             rec.ratio_c4 = round((rec.total_acres or 0.0) * 2.0, 4)
             rec.ratio_c8 = round((rec.total_acres or 0.0) * 0.25, 4)
 
-    @api.depends("plot_ids.size_marla", "total_marla")
+    @api.depends("used_marla", "total_marla")
     def _compute_remaining_marla(self):
         for rec in self:
-            used = sum([p.size_marla for p in rec.plot_ids if not getattr(p, "is_security", False)])
-            rec.remaining_marla = round((rec.total_marla or 0.0) - used, 2)
+            rec.remaining_marla = round((rec.total_marla or 0.0) - (rec.used_marla or 0.0), 2)
+
+    def _recompute_used_marla(self):
+        """Resynchronise used_marla with one grouped aggregate over the plots of the projects."""
+        groups = self.env["land.plot"]._read_group(
+            [("project_id", "in", self.ids), ("is_security", "=", False)],
+            ["project_id"], ["size_marla:sum"],
+        )
+        used = {project.id: size for project, size in groups}
+        for rec in self:
+            value = round(used.get(rec.id) or 0.0, 2)
+            if rec.used_marla != value:
+                rec.used_marla = value
+
+    @api.model
+    def _init_used_marla(self):
+        self.search([])._recompute_used_marla()
+
+    # ---------------- Plot Pricing ----------------
+    def _get_plot_price_table(self):
+        """
+        (size_marla, cost, security_amount) of a plot per (category, is_security).
+        Cost only depends on these two keys and cost_per_marla, so the handful of
+        distinct prices of a project are computed once and shared by all its plots.
+        """
+        base = (self.cost_per_marla or 0.0) if self else 0.0
+        table = {}
+        for category in PLOT_CATEGORIES + ("sec",):
+            size_marla = PLOT_SIZE_MAP.get(category, 0.0)
+            normal_cost = round(base * size_marla * PLOT_PREMIUM_MAP.get(category, 1.0), 2)
+            table[(category, False)] = (size_marla, normal_cost, 0.0)
+            # security plots are charged the full plot price as security amount
+            table[(category, True)] = (size_marla, normal_cost, normal_cost)
+        return table
+
+    def _reprice_plots(self):
+        """
+        Re-cost every plot of the projects with one set-based UPDATE per
+        (category, security) price group. Only rows whose values change are
+        written. Returns the number of plots changed.
+        """
+        Plot = self.env["land.plot"]
+        Plot.flush_model(["project_id", "category", "is_security", "size_marla", "cost", "security_amount"])
+        changed = 0
+        for rec in self:
+            for (category, is_security), (size_marla, cost, security_amount) in rec._get_plot_price_table().items():
+                self.env.cr.execute("""
+                    UPDATE land_plot
+                       SET size_marla = %(size)s, cost = %(cost)s, security_amount = %(security)s
+                     WHERE project_id = %(project)s
+                       AND category = %(category)s
+                       AND COALESCE(is_security, FALSE) = %(is_security)s
+                       AND (size_marla IS DISTINCT FROM %(size)s
+                            OR cost IS DISTINCT FROM %(cost)s
+                            OR security_amount IS DISTINCT FROM %(security)s)
+                """, {
+                    "size": size_marla,
+                    "cost": cost,
+                    "security": security_amount,
+                    "project": rec.id,
+                    "category": category,
+                    "is_security": is_security,
+                })
+                changed += self.env.cr.rowcount
+        if changed:
+            Plot.invalidate_model(["size_marla", "cost", "security_amount"])
+            self._recompute_used_marla()
+        return changed
+
+    def action_reprice_plots(self):
+        changed = self._reprice_plots()
+        for rec in self:
+            rec.message_post(body=_("Plots repriced at %s per marla.") % rec.cost_per_marla)
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Reprice Plots"),
+                "message": _("%s plot(s) changed.") % changed,
+                "sticky": False,
+                "type": "success",
+                "next": {"type": "ir.actions.client", "tag": "soft_reload"},
+            },
+        }
 
     @api.depends("land_base_cost", "registry_fee", "fard_fee", "land_price", "intiqal_fee",
                  "commission_amount", "purchase_tax", "other_fee")
@@ -158,113 +331,296 @@ class LandProject(models.Model):
 
     # ---------------- Automatic Plot Generation ----------------
 
-    @api.onchange("total_acres", "project_type")
-    def _onchange_total_acres_auto_generate_plots(self):
+    def _get_plot_count_values(self):
+        """Display counts (floats) of normal and security plots per category."""
+        self.ensure_one()
+        vals = {}
+        if not self.total_acres or self.total_acres <= 0:
+            for cat in PLOT_CATEGORIES:
+                vals[f"cnt_{cat}"] = vals[f"sec_cnt_{cat}"] = 0.0
+            return vals
+
+        sec_pct = self.security_pct or 0.0
+        for cat in PLOT_CATEGORIES:
+            base = self[f"ratio_{cat}"]
+            vals[f"cnt_{cat}"] = base * (1 - sec_pct)
+            vals[f"sec_cnt_{cat}"] = base - vals[f"cnt_{cat}"]
+        return vals
+
+    def _get_plot_targets(self):
+        """Integer (normal, security) plot counts per category, decimals truncated."""
+        self.ensure_one()
+        vals = self._get_plot_count_values()
+        return {
+            cat: (int(vals[f"cnt_{cat}"]), int(vals[f"sec_cnt_{cat}"]))
+            for cat in PLOT_CATEGORIES
+        }
+
+    def _prepare_plot_vals(self, category, numbers, is_security=False, parent_plot_ids=None):
+        self.ensure_one()
+        size = PLOT_SIZE_MAP[category]
+        prefix = PLOT_CODE_MAP[category]
+        suffix = "_SEC" if is_security else ""
+        numbers = list(numbers)
+        parent_plot_ids = parent_plot_ids or [False] * len(numbers)
+        return [{
+            "project_id": self.id,
+            "category": category,
+            "number": number,
+            "name": f"{prefix}_{number:03d}{suffix}",
+            "size_marla": size,
+            "is_security": is_security,
+            "parent_plot_id": parent_plot_id,
+        } for number, parent_plot_id in zip(numbers, parent_plot_ids)]
+
+    def _pair_security_plots(self, numbers, normals):
+        """
+        Parent plot id of each security plot number, resolved in memory with
+        the project's pairing strategy. ``normals`` maps the numbers of the
+        candidate normal plots to their ids.
+        """
+        self.ensure_one()
+        if not normals:
+            return [False] * len(numbers)
+        ordered = [normals[number] for number in sorted(normals)]
+        if self.security_pairing == "same_number":
+            return [normals.get(number, ordered[0]) for number in numbers]
+        if self.security_pairing == "round_robin":
+            return [ordered[(number - 1) % len(ordered)] for number in numbers]
+        return [ordered[0]] * len(numbers)
+
+    def _create_plots_batched(self, vals_list):
+        """Create plots with one multi-row INSERT per PLOT_CREATE_BATCH rows."""
+        Plot = self.env["land.plot"]
+        plot_ids = []
+        for start in range(0, len(vals_list), PLOT_CREATE_BATCH):
+            plot_ids += Plot.create(vals_list[start:start + PLOT_CREATE_BATCH]).ids
+        return Plot.browse(plot_ids)
+
+    def _generate_plots(self, rebuild=False):
+        """
+        Bring the plots of each project in line with its acreage.
+        Projects that already have plots are reconciled in place unless
+        ``rebuild`` is set, in which case every plot is dropped and recreated;
+        a rebuild is refused while any plot is reserved, sold or converted.
+        """
         for rec in self:
+            started = time.perf_counter()
+            rec.write(rec._get_plot_count_values())
+            all_plots = rec.with_context(active_test=False).plot_ids
+            if all_plots and not rebuild:
+                stats = rec._reconcile_plots()
+            else:
+                # reserved, sold or converted plots must never be deleted either
+                locked = all_plots.filtered(lambda p: p.state != "available" or p.product_id)
+                if locked:
+                    raise UserError(_(
+                        "The plots of project %s cannot be rebuilt: these plots are reserved, "
+                        "sold or already converted to products:\n%s"
+                    ) % (rec.name, ", ".join(sorted(locked.mapped("name")))))
+                all_plots.unlink()
+                stats = rec._rebuild_plots()
+
+            elapsed = time.perf_counter() - started
+            touched = stats["created"] + stats["restored"] + stats["archived"]
+            _logger.info(
+                "%s plots of project %s (%s acres): %s created (%s security), %s restored, "
+                "%s archived in %.3fs (%.3f ms/plot)",
+                "Reconciled" if stats["mode"] == "reconcile" else "Generated",
+                rec.name, rec.total_acres, stats["created"], stats["security"], stats["restored"],
+                stats["archived"], elapsed, (elapsed * 1000.0 / touched) if touched else 0.0,
+            )
+            rec.message_post(body=_(
+                "Plots updated in %(elapsed).2f s: %(created)s created (%(security)s security), "
+                "%(restored)s restored, %(archived)s archived."
+            ) % dict(stats, elapsed=elapsed))
+
+    def _rebuild_plots(self):
+        """Insert every plot of an empty project. Security plots are linked to their parent in the same pass."""
+        self.ensure_one()
+        targets = self._get_plot_targets()
+        normal_vals = []
+        for cat in PLOT_CATEGORIES:
+            normal_vals += self._prepare_plot_vals(cat, range(1, targets[cat][0] + 1))
+        normals = self._create_plots_batched(normal_vals)
+
+        normals_by_cat = {cat: {} for cat in PLOT_CATEGORIES}
+        for vals, plot_id in zip(normal_vals, normals.ids):
+            normals_by_cat[vals["category"]][vals["number"]] = plot_id
+
+        security_vals = []
+        for cat in PLOT_CATEGORIES:
+            numbers = range(1, targets[cat][1] + 1)
+            security_vals += self._prepare_plot_vals(
+                cat, numbers, is_security=True,
+                parent_plot_ids=self._pair_security_plots(numbers, normals_by_cat[cat]),
+            )
+        securities = self._create_plots_batched(security_vals)
+        return {
+            "mode": "rebuild",
+            "created": len(normals) + len(securities),
+            "security": len(securities),
+            "restored": 0,
+            "archived": 0,
+        }
 
-            # ---------------- RESET IF INVALID ----------------
-            if not rec.total_acres or rec.total_acres <= 0:
-                rec.plot_ids = [(5, 0, 0)]
-                rec.cnt_r5 = rec.cnt_r10 = rec.cnt_c4 = rec.cnt_c8 = 0.0
-                rec.sec_cnt_r10 = rec.sec_cnt_r5 = rec.sec_cnt_c4 = rec.sec_cnt_c8 = 0.0
-                continue
+    def _reconcile_plots(self):
+        """
+        Diff the target count of every (category, security) bucket against the
+        existing plots: only missing numbers are inserted (or restored when an
+        archived plot holds the number), numbers above the target are archived
+        and every other plot is left untouched. Surplus plots that are reserved,
+        sold or converted to products block the reduction with a UserError.
+        """
+        self.ensure_one()
+        Plot = self.env["land.plot"].with_context(active_test=False)
+        targets = self._get_plot_targets()
+
+        existing = {}
+        locked = {}
+        for row in Plot.search_read(
+                [("project_id", "=", self.id), ("category", "in", PLOT_CATEGORIES)],
+                ["name", "category", "number", "is_security", "active", "state", "product_id"]):
+            existing[(row["category"], row["is_security"], row["number"])] = (row["id"], row["active"])
+            if row["state"] != "available" or row["product_id"]:
+                # reserved, sold or converted plots must never be archived away
+                locked[row["id"]] = row["name"]
+
+        to_restore, to_archive = [], []
+        blocking = []
+        missing = {}
+        for (cat, is_security, number), (plot_id, active) in existing.items():
+            target = targets[cat][1 if is_security else 0]
+            if number > target and active:
+                if plot_id in locked:
+                    blocking.append(locked[plot_id])
+                else:
+                    to_archive.append(plot_id)
+            elif number <= target and not active:
+                to_restore.append(plot_id)
+        if blocking:
+            raise UserError(_(
+                "The plot counts of project %s cannot be reduced: these plots are reserved, "
+                "sold or already converted to products:\n%s"
+            ) % (self.name, ", ".join(sorted(blocking))))
+        for cat in PLOT_CATEGORIES:
+            for is_security in (False, True):
+                target = targets[cat][1 if is_security else 0]
+                missing[(cat, is_security)] = [
+                    n for n in range(1, target + 1) if (cat, is_security, n) not in existing
+                ]
+
+        Plot.browse(to_archive).write({"active": False})
+        Plot.browse(to_restore).write({"active": True})
+
+        normal_vals = []
+        for cat in PLOT_CATEGORIES:
+            normal_vals += self._prepare_plot_vals(cat, missing[(cat, False)])
+        normals = self._create_plots_batched(normal_vals)
+
+        # candidate parents of new security plots: the normal plots still in range
+        normals_by_cat = {cat: {} for cat in PLOT_CATEGORIES}
+        for (cat, is_security, number), (plot_id, _active) in existing.items():
+            if not is_security and number <= targets[cat][0]:
+                normals_by_cat[cat][number] = plot_id
+        for vals, plot_id in zip(normal_vals, normals.ids):
+            normals_by_cat[vals["category"]][vals["number"]] = plot_id
+
+        security_vals = []
+        for cat in PLOT_CATEGORIES:
+            numbers = missing[(cat, True)]
+            security_vals += self._prepare_plot_vals(
+                cat, numbers, is_security=True,
+                parent_plot_ids=self._pair_security_plots(numbers, normals_by_cat[cat]),
+            )
+        securities = self._create_plots_batched(security_vals)
+        return {
+            "mode": "reconcile",
+            "created": len(normals) + len(securities),
+            "security": len(securities),
+            "restored": len(to_restore),
+            "archived": len(to_archive),
+        }
 
-            sec_pct = rec.security_pct or 0.0
-
-            # ---------------- BASE RATIOS ----------------
-            base_r5 = rec.ratio_r5
-            base_r10 = rec.ratio_r10
-            base_c4 = rec.ratio_c4
-            base_c8 = rec.ratio_c8
-
-            # ---------------- DISPLAY COUNTS (FLOATS) ----------------
-            rec.cnt_r5 = base_r5 * (1 - sec_pct)
-            rec.cnt_r10 = base_r10 * (1 - sec_pct)
-            rec.cnt_c4 = base_c4 * (1 - sec_pct)
-            rec.cnt_c8 = base_c8 * (1 - sec_pct)
-
-            rec.sec_cnt_r5 = base_r5 - rec.cnt_r5
-            rec.sec_cnt_r10 = base_r10 - rec.cnt_r10
-            rec.sec_cnt_c4 = base_c4 - rec.cnt_c4
-            rec.sec_cnt_c8 = base_c8 - rec.cnt_c8
-
-            # ---------------- PURE INTEGER COUNTS ----------------
-            full_r5 = int(rec.cnt_r5)
-            full_r10 = int(rec.cnt_r10)
-            full_c4 = int(rec.cnt_c4)
-            full_c8 = int(rec.cnt_c8)
-
-            # For security plots, truncate decimals (floor behavior)
-            sec_r5 = int(rec.sec_cnt_r5)
-            sec_r10 = int(rec.sec_cnt_r10)
-            sec_c4 = int(rec.sec_cnt_c4)
-            sec_c8 = int(rec.sec_cnt_c8)
-
-            cmds = [(5, 0, 0)]  # clear old plots
-
-            size_map = {
-                "r10": TEN_MARLA,
-                "r5": FIVE_MARLA,
-                "c8": EIGHT_MARLA_C,
-                "c4": FOUR_MARLA_C,
-            }
-            code_map = {
-                "r10": "RES_10",
-                "r5": "RES_5",
-                "c8": "COM_8",
-                "c4": "COM_4",
-            }
+    @api.onchange("total_acres", "project_type")
+    def _onchange_total_acres_plot_counts(self):
+        # Only refresh the display counts, plots are generated on the server when saving
+        for rec in self:
+            rec.update(rec._get_plot_count_values())
+
+    def action_generate_plots(self):
+        self._generate_plots()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Plot Generation"),
+                "message": _("Plots successfully generated."),
+                "sticky": False,
+                "type": "success",
+                "next": {"type": "ir.actions.client", "tag": "soft_reload"},
+            },
+        }
 
-            # ---------------- PROCESS EACH CATEGORY ----------------
-            for cat, normal_cnt, sec_cnt in [
-                ("r10", full_r10, sec_r10),
-                ("r5", full_r5, sec_r5),
-                ("c8", full_c8, sec_c8),
-                ("c4", full_c4, sec_c4),
-            ]:
-                size = size_map[cat]
-                prefix = code_map[cat]
-                parent_indexes = []
-
-                # ------ NORMAL PLOTS ------
-                for i in range(normal_cnt):
-                    idx = i + 1
-                    cmds.append((0, 0, {
-                        "category": cat,
-                        "number": idx,
-                        "name": f"{prefix}_{idx:03d}",
-                        "size_marla": size,
-                        "is_security": False,
-                    }))
-                    parent_indexes.append(idx)
-
-                # ------ SECURITY PLOTS ------
-                sec_cnt_int = int(sec_cnt)  # <-- truncate decimals
-                for i in range(sec_cnt_int):
-                    idx = i + 1
-                    parent_id = parent_indexes[0] if parent_indexes else False
-                    cmds.append((0, 0, {
-                        "category": cat,
-                        "number": idx,
-                        "name": f"{prefix}_{idx:03d}_SEC",
-                        "size_marla": size,
-                        "is_security": True,
-                        "parent_plot_id": parent_id,
-                    }))
-
-            rec.plot_ids = cmds
+    def action_rebuild_plots(self):
+        self._generate_plots(rebuild=True)
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Plot Generation"),
+                "message": _("All plots were rebuilt from scratch."),
+                "sticky": False,
+                "type": "warning",
+                "next": {"type": "ir.actions.client", "tag": "soft_reload"},
+            },
+        }
 
     # ---------------- FIX CREATE METHOD ----------------
-    @api.model
+    @api.model_create_multi
     def create(self, vals_list):
         records = super().create(vals_list)
-        for rec in records:
-            normal_plots = rec.plot_ids.filtered(lambda p: not p.is_security)
-            for plot in rec.plot_ids.filtered(lambda p: p.is_security):
-                if normal_plots and not plot.parent_plot_id:
-                    plot.parent_plot_id = normal_plots[0].id
+        records.filtered(lambda r: not r.plot_ids and r.total_acres > 0)._generate_plots(rebuild=True)
+        records._link_security_plots()
         return records
 
+    def _link_security_plots(self):
+        """
+        Give a parent to the security plots created without one (e.g. passed
+        in through plot_ids). Plots are scanned once per project and linked
+        with one write per resolved parent.
+        """
+        Plot = self.env["land.plot"]
+        for rec in self:
+            normals, orphans = {}, {}
+            first_normal_id = False
+            for plot in rec.plot_ids:
+                if not plot.is_security:
+                    normals.setdefault(plot.category, {})[plot.number] = plot.id
+                    first_normal_id = first_normal_id or plot.id
+                elif not plot.parent_plot_id:
+                    orphans.setdefault(plot.category, []).append(plot)
+            if not orphans or not first_normal_id:
+                continue
+
+            # categories without normal plots fall back to the first normal plot of the project
+            fallback = {0: first_normal_id}
+            by_parent = {}
+            for cat, plots in orphans.items():
+                parent_ids = rec._pair_security_plots([p.number for p in plots], normals.get(cat) or fallback)
+                for plot, parent_id in zip(plots, parent_ids):
+                    by_parent.setdefault(parent_id, []).append(plot.id)
+            for parent_id, plot_ids in by_parent.items():
+                Plot.browse(plot_ids).write({"parent_plot_id": parent_id})
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {"total_acres", "project_type"} & set(vals):
+            self._generate_plots()
+        if PLOT_COST_FIELDS & set(vals):
+            self._reprice_plots()
+        return res
+
     # ---------------- Security Counts & Totals ----------------
     # @api.depends("plot_ids", "plot_ids.is_security", "plot_ids.category", "plot_ids.security_amount")
     # def _compute_security_counts(self):
@@ -276,82 +632,264 @@ class LandProject(models.Model):
 
     # ---------------- Convert to Inventory ----------------
     def action_convert_to_inventory(self):
-        Template = self.env["product.template"]
-        ProductCategory = self.env["product.category"]
-        Attachment = self.env["ir.attachment"]
-        Account = self.env["account.account"]
-        PurchaseOrder = self.env["purchase.order"]
-        PurchaseLine = self.env["purchase.order.line"]
+        """Queue the conversion; plots are converted in chunks by the inventory conversion cron."""
+        for rec in self:
+            if not rec.plot_ids:
+                raise UserError(_("No plots found in project '%s'. Generate plots first.") % rec.name)
+            if rec.conversion_state in ("queued", "running"):
+                raise UserError(_("Project '%s' is already being converted to inventory.") % rec.name)
+
+        self.write({
+            "conversion_state": "queued",
+            "conversion_error": False,
+        })
+        self.env.ref("land_plot_manager.ir_cron_convert_to_inventory")._trigger()
+        return {
+            "type": "ir.actions.client",
+            "tag": "display_notification",
+            "params": {
+                "title": _("Inventory & Purchase Creation"),
+                "message": _("Conversion queued. Plots are converted in the background, "
+                             "progress is shown on the project."),
+                "sticky": False,
+                "type": "info",
+                "next": {"type": "ir.actions.client", "tag": "soft_reload"},
+            },
+        }
 
+    @api.depends("conversion_done", "conversion_total")
+    def _compute_conversion_progress(self):
+        for rec in self:
+            rec.conversion_progress = (
+                round(rec.conversion_done * 100.0 / rec.conversion_total, 2) if rec.conversion_total else 0.0
+            )
+
+    def get_conversion_progress(self):
+        """Lightweight progress payload polled by the UI while the conversion job runs."""
+        return [{
+            "id": rec.id,
+            "state": rec.conversion_state,
+            "done": rec.conversion_done,
+            "total": rec.conversion_total,
+            "progress": rec.conversion_progress,
+            "error": rec.conversion_error or False,
+        } for rec in self]
+
+    @api.model
+    def _cron_convert_to_inventory(self):
+        # "running" projects were interrupted (crash, worker restart): they resume where they stopped
+        for project in self.search([("conversion_state", "in", ("queued", "running"))]):
+            project._run_inventory_conversion()
+
+    def _commit_conversion_progress(self):
+        if not getattr(threading.current_thread(), "testing", False):
+            self.env.cr.commit()
+
+    def _run_inventory_conversion(self):
+        """
+        Convert the plots without product in chunks of ``conversion_chunk_size``,
+        committing after each chunk. Plots that already have a product are the
+        resume point, so a crashed run simply continues on the next call.
+        """
+        self.ensure_one()
+        Plot = self.env["land.plot"]
+        todo_domain = [("project_id", "=", self.id), ("product_id", "=", False)]
+
+        total = Plot.search_count([("project_id", "=", self.id)])
+        vals = {
+            "conversion_state": "running",
+            "conversion_total": total,
+        }
+        if self.conversion_state == "queued" and Plot.search_count(todo_domain) == total:
+            # fresh run (no plot converted yet): products go to a new purchase order;
+            # a failed run queued again resumes on its existing draft purchase order
+            vals["conversion_purchase_id"] = False
+        self.write(vals)
+        self._commit_conversion_progress()
+
+        converted = 0
+        try:
+            with self.env.cr.savepoint():
+                conversion_ctx = self._prepare_conversion_context()
+            while True:
+                plots = Plot.search(todo_domain, limit=self.conversion_chunk_size or 200, order="id")
+                if not plots:
+                    break
+                query_count = self.env.cr.sql_log_count
+                started = time.perf_counter()
+                # a failing chunk is rolled back alone; committed chunks are kept
+                with self.env.cr.savepoint():
+                    products = self._convert_plots_to_products(plots, conversion_ctx)
+                    self._add_products_to_purchase_order(products)
+                    self.env.flush_all()
+                _logger.info(
+                    "Project %s: converted %s plots in %s queries (%.3fs)",
+                    self.name, len(products), self.env.cr.sql_log_count - query_count,
+                    time.perf_counter() - started,
+                )
+                converted += len(products)
+                self.conversion_done = self.conversion_total - Plot.search_count(todo_domain)
+                self._commit_conversion_progress()
+        except Exception as e:
+            # any failure ends the run as "failed" so the cron does not retry it forever
+            if not isinstance(e, UserError):
+                _logger.exception("Inventory conversion of project %s failed", self.name)
+            self.env.invalidate_all()
+            self.write({"conversion_state": "failed", "conversion_error": str(e)})
+            self.message_post(body=_("Inventory conversion stopped: %s") % e)
+            self._commit_conversion_progress()
+            return False
+
+        self.conversion_state = "done"
+        if self.conversion_purchase_id:
+            self.message_post(body=_("✅ %s products created and added to Purchase Order <b>%s</b>.") %
+                                   (converted, self.conversion_purchase_id.name))
+        self._commit_conversion_progress()
+        return True
+
+    def _prepare_conversion_context(self):
+        """Values resolved once per conversion run and shared by every chunk."""
+        Template = self.env["product.template"]
         field_name = "detailed_type" if "detailed_type" in Template._fields else "type"
-        sel_keys = [k for k, _ in (Template._fields[field_name].selection or [])]
+        sel_keys = [k for k, _label in (Template._fields[field_name].selection or [])]
         preferred_order = ["product", "storable", "consu", "service"]
         field_value = next((p for p in preferred_order if p in sel_keys), sel_keys[0] if sel_keys else None)
 
-        category_map = {
-            "r10": "Residential 10 Marla",
-            "r5": "Residential 5 Marla",
-            "c8": "Commercial 8 Marla",
-            "c4": "Commercial 4 Marla",
-            "sec": "Security",
+        category_names = list(INVENTORY_CATEGORY_MAP.values()) + [SECURITY_CATEGORY_NAME, "Other"]
+        categories = {}
+        for categ in self.env["product.category"].search([("name", "in", category_names)]):
+            categories.setdefault(categ.name, categ.id)
+
+        income_acc = self.env["account.account"].search([("code", "=", "400000")], limit=1)
+        return {
+            "type_field": field_name,
+            "type_value": field_value,
+            "categories": categories,
+            "income_account_id": income_acc.id,
+            # document store: content checksum -> stored ir.attachment id
+            "documents": {},
         }
 
-        if "product_uom_id" in PurchaseLine._fields:
-            po_line_uom_field = "product_uom_id"
-        elif "product_uom" in PurchaseLine._fields:
-            po_line_uom_field = "product_uom"
-        else:
-            po_line_uom_field = None
-
-        ResPartner = self.env["res.partner"]
-
-        for rec in self:
-            if not rec.plot_ids:
-                raise UserError(_("No plots found in project '%s'. Generate plots first.") % rec.name)
-
-        created_products = []
-        for plot in rec.plot_ids:
-            # Skip if already converted
-            if plot.product_id:
-                created_products.append(plot.product_id)
-                continue
-
+    def _get_document_sources(self, plots):
+        """
+        Metadata of the stored files behind the document fields of the plots,
+        their parent plots and the project, keyed by (model, id, field).
+        The file contents are never read.
+        """
+        self.ensure_one()
+        plot_ids = (plots | plots.parent_plot_id).ids
+        domain = [
+            "|",
+            "&", "&",
+            ("res_model", "=", "land.plot"),
+            ("res_id", "in", plot_ids),
+            ("res_field", "in", [doc[1] for doc in DOCUMENT_FIELDS]),
+            "&", "&",
+            ("res_model", "=", "land.project"),
+            ("res_id", "=", self.id),
+            ("res_field", "in", [doc[3] for doc in DOCUMENT_FIELDS]),
+        ]
+        sources = {}
+        for att in self.env["ir.attachment"].sudo().search_read(
+                domain, ["res_model", "res_id", "res_field", "checksum", "store_fname", "file_size", "mimetype"]):
+            sources[(att["res_model"], att["res_id"], att["res_field"])] = att
+        return sources
+
+    def _store_document(self, conversion_ctx, source, fname):
+        """
+        Return the stored attachment holding this content. Documents are keyed
+        by content checksum, so every product referencing the same file links
+        one blob. A new entry only copies the attachment metadata and points
+        to the file already in the filestore.
+        """
+        self.ensure_one()
+        Attachment = self.env["ir.attachment"].sudo()
+        store = conversion_ctx["documents"]
+        checksum = source["checksum"]
+
+        if checksum not in store:
+            stored = Attachment.search([
+                ("res_model", "=", "land.project"),
+                ("res_id", "=", self.id),
+                ("res_field", "=", False),
+                ("checksum", "=", checksum),
+            ], limit=1)
+            if not stored:
+                vals = {
+                    "name": fname,
+                    "res_model": "land.project",
+                    "res_id": self.id,
+                    "type": "binary",
+                    "mimetype": source["mimetype"] or "application/pdf",
+                }
+                if not source["store_fname"]:
+                    # database storage: there is no shared file to point to
+                    vals["raw"] = Attachment.browse(source["id"]).raw
+                stored = Attachment.create(vals)
+                if source["store_fname"]:
+                    # ir.attachment.create() drops store_fname/checksum/file_size,
+                    # so point the new row at the existing file afterwards
+                    self.env.cr.execute("""
+                        UPDATE ir_attachment
+                           SET store_fname = %s, checksum = %s, file_size = %s, db_datas = NULL
+                         WHERE id = %s
+                    """, (source["store_fname"], checksum, source["file_size"], stored.id))
+                    stored.invalidate_recordset(["store_fname", "checksum", "file_size", "db_datas", "raw", "datas"])
+            store[checksum] = stored.id
+        return store[checksum]
+
+    def _get_conversion_category(self, conversion_ctx, cat_name):
+        categories = conversion_ctx["categories"]
+        if cat_name not in categories:
+            categories[cat_name] = self.env["product.category"].create({"name": cat_name}).id
+        return categories[cat_name]
+
+    def _convert_plots_to_products(self, plots, conversion_ctx=None):
+        """
+        Create one product (with its documents) per plot and link it back to
+        the plot. Templates are created with one multi-create and documents
+        come from the document store, so the query count of a chunk does not
+        grow with its size.
+        """
+        self.ensure_one()
+        conversion_ctx = conversion_ctx or self._prepare_conversion_context()
+        rec = self
+        sources = self._get_document_sources(plots)
+
+        template_vals_list = []
+        for plot in plots:
             # set attachments and product info depending on security
             if plot.is_security and plot.parent_plot_id:
-                registry_b64 = plot.registry_attachment or plot.parent_plot_id.registry_attachment or rec.registry_attachment_project
-                fard_b64 = plot.fard_attachment or plot.parent_plot_id.fard_attachment or rec.fard_attachment_project
-                intiqal_b64 = plot.intiqal_attachment or plot.parent_plot_id.intiqal_attachment or rec.intiqal_attachment_project
-                registry_fname = plot.registry_filename or plot.parent_plot_id.registry_filename or rec.registry_filename_project
-                fard_fname = plot.fard_filename or plot.parent_plot_id.fard_filename or rec.fard_filename_project
-                intiqal_fname = plot.intiqal_filename or plot.parent_plot_id.intiqal_filename or rec.intiqal_filename_project
+                doc_records = [plot, plot.parent_plot_id, rec]
                 prod_name = f"{plot.parent_plot_id.name}-SECURITY"
                 prod_price = plot.security_amount or plot.cost or 0.0
-                cat_name = "Security Charge"
+                cat_name = SECURITY_CATEGORY_NAME
             else:
-                registry_b64 = plot.registry_attachment or rec.registry_attachment_project
-                fard_b64 = plot.fard_attachment or rec.fard_attachment_project
-                intiqal_b64 = plot.intiqal_attachment or rec.intiqal_attachment_project
-                registry_fname = plot.registry_filename or rec.registry_filename_project
-                fard_fname = plot.fard_filename or rec.fard_filename_project
-                intiqal_fname = plot.intiqal_filename or rec.intiqal_filename_project
+                doc_records = [plot, rec]
                 prod_name = plot.name
                 prod_price = plot.cost or 0.0
-                cat_name = category_map.get(plot.category, "Other")
+                cat_name = INVENTORY_CATEGORY_MAP.get(plot.category, "Other")
 
-            # Validate docs (for non-security ensure docs exist; security may reuse parent/project)
+            # Resolve each document to the first record of the chain holding it
+            documents = []
             missing = []
-            if not registry_b64: missing.append("Registry")
-            if not fard_b64: missing.append("Fard")
-            if not intiqal_b64: missing.append("Intiqal")
+            for label, plot_field, plot_fname, project_field, project_fname in DOCUMENT_FIELDS:
+                for record in doc_records:
+                    field, fname_field = (
+                        (project_field, project_fname) if record._name == "land.project" else (plot_field, plot_fname)
+                    )
+                    source = sources.get((record._name, record.id, field))
+                    if source:
+                        documents.append((source, record[fname_field] or f"{prod_name}.pdf"))
+                        break
+                else:
+                    missing.append(label)
+
+            # Validate docs (for non-security ensure docs exist; security may reuse parent/project)
             if missing:
                 raise UserError(_("Please upload missing docs (%s) for project %s") %
                                 (", ".join(missing),  rec.name))
 
-            # Product Category
-            product_categ = ProductCategory.search([("name", "=", cat_name)], limit=1)
-            if not product_categ:
-                product_categ = ProductCategory.create({"name": cat_name})
-
             # Product Template values
             vals = {
                 "name": prod_name,
@@ -359,98 +897,94 @@ class LandProject(models.Model):
                 "standard_price": prod_price,
                 "sale_ok": True,
                 "purchase_ok": True,
-                "categ_id": product_categ.id,
+                "categ_id": self._get_conversion_category(conversion_ctx, cat_name),
+                # security charge products are "sec", so they never decide a commission category
+                "plot_category": "sec" if plot.is_security else plot.category,
             }
-            if field_value:
-                vals[field_name] = field_value
-
-            tmpl = Template.create(vals)
-
+            if conversion_ctx["type_value"]:
+                vals[conversion_ctx["type_field"]] = conversion_ctx["type_value"]
             # Optional: set income account if present
-            income_acc = Account.search([("code", "=", "400000")], limit=1)
-            if income_acc:
-                tmpl.property_account_income_id = income_acc.id
-
+            if conversion_ctx["income_account_id"]:
+                vals["property_account_income_id"] = conversion_ctx["income_account_id"]
+            # Link docs to the product through the checksum keyed document store
+            vals["land_document_ids"] = [Command.set([
+                self._store_document(conversion_ctx, source, fname) for source, fname in documents
+            ])]
+            template_vals_list.append(vals)
+
+        templates = self.env["product.template"].create(template_vals_list)
+
+        product_ids = []
+        for plot, tmpl in zip(plots, templates):
             product_variant = tmpl.product_variant_id
             plot.product_id = product_variant.id
-            created_products.append(product_variant)
-
-            # Attach docs to product.template as ir.attachment
-            for b64, fname in [
-                (registry_b64, registry_fname),
-                (fard_b64, fard_fname),
-                (intiqal_b64, intiqal_fname),
-            ]:
-                if not b64:
-                    continue
-                Attachment.sudo().create({
-                    "name": (fname or f"{prod_name}.pdf"),
-                    "res_model": "product.template",
-                    "res_id": tmpl.id,
-                    "type": "binary",
-                    "datas": b64,
-                    "mimetype": "application/pdf",
-                })
-
-        # ---------------- Create Purchase Order for created products ----------------
-        if created_products:
-            vendor = getattr(rec, "supplier_id", False) or False
+            product_ids.append(product_variant.id)
+        return self.env["product.product"].browse(product_ids)
 
-            if not vendor:
-                if "supplier_rank" in ResPartner._fields:
-                    vendor = ResPartner.search([("supplier_rank", ">", 0)], limit=1)
+    def _get_conversion_vendor(self):
+        self.ensure_one()
+        ResPartner = self.env["res.partner"]
+        vendor = self.supplier_id
 
-            if not vendor:
-                if "supplier" in ResPartner._fields:
-                    vendor = ResPartner.search([("supplier", "=", True)], limit=1)
+        if not vendor:
+            if "supplier_rank" in ResPartner._fields:
+                vendor = ResPartner.search([("supplier_rank", ">", 0)], limit=1)
 
-            if not vendor:
-                vendor = ResPartner.search([], limit=1)
+        if not vendor:
+            if "supplier" in ResPartner._fields:
+                vendor = ResPartner.search([("supplier", "=", True)], limit=1)
 
-            if not vendor:
-                vendor_vals = {
-                    "name": _("Default Supplier for %s") % (rec.name or self.env.company.name),
-                    "supplier_rank": 1,
-                    "company_type": "company",
-                }
-                vendor = ResPartner.sudo().create(vendor_vals)
-                rec.message_post(body=_(
-                    "No supplier found; created default supplier <b>%s</b> to continue conversion.") % vendor.name)
+        if not vendor:
+            vendor = ResPartner.search([], limit=1)
 
-            po_vals = {
-                "partner_id": vendor.id,
-                "origin": rec.name,
+        if not vendor:
+            vendor_vals = {
+                "name": _("Default Supplier for %s") % (self.name or self.env.company.name),
+                "supplier_rank": 1,
+                "company_type": "company",
             }
-            po = PurchaseOrder.create(po_vals)
-
-            uom = self.env.ref("uom.product_uom_unit", raise_if_not_found=False)
-            for product in created_products:
-                price = getattr(product, "list_price", False) or (
-                    product.product_tmpl_id.list_price if product.product_tmpl_id else 0.0)
-                line_vals = {
-                    "order_id": po.id,
-                    "name": product.display_name,
-                    "product_id": product.id,
-                    "product_qty": 1,
-                    "price_unit": price,
-                }
-                if po_line_uom_field and uom:
-                    line_vals[po_line_uom_field] = uom.id
-                PurchaseLine.create(line_vals)
-
-            rec.message_post(body=_("✅ %s products created and added to Purchase Order <b>%s</b>.") %
-                                  (len(created_products), po.name))
-
-            return {
-                "type": "ir.actions.client",
-                "tag": "display_notification",
-                "params": {
-                    "title": _("Inventory & Purchase Creation"),
-                    "message": _("Plots successfully converted into Products and Purchase Order created."),
-                    "sticky": False,
-                    "type": "success",
-                },
+            vendor = ResPartner.sudo().create(vendor_vals)
+            self.message_post(body=_(
+                "No supplier found; created default supplier <b>%s</b> to continue conversion.") % vendor.name)
+        return vendor
+
+    def _add_products_to_purchase_order(self, products):
+        """Append the products to the purchase order of the current conversion run."""
+        self.ensure_one()
+        if not products:
+            return False
+        PurchaseLine = self.env["purchase.order.line"]
+
+        po = self.conversion_purchase_id
+        if not po or po.state not in ("draft", "sent"):
+            po = self.env["purchase.order"].create({
+                "partner_id": self._get_conversion_vendor().id,
+                "origin": self.name,
+            })
+            self.conversion_purchase_id = po
+
+        if "product_uom_id" in PurchaseLine._fields:
+            po_line_uom_field = "product_uom_id"
+        elif "product_uom" in PurchaseLine._fields:
+            po_line_uom_field = "product_uom"
+        else:
+            po_line_uom_field = None
+
+        uom = self.env.ref("uom.product_uom_unit", raise_if_not_found=False)
+        line_vals_list = []
+        for product in products:
+            line_vals = {
+                "order_id": po.id,
+                "name": product.display_name,
+                "product_id": product.id,
+                "product_qty": 1,
+                "price_unit": product.list_price or 0.0,
             }
+            if po_line_uom_field and uom:
+                line_vals[po_line_uom_field] = uom.id
+            line_vals_list.append(line_vals)
+        PurchaseLine.create(line_vals_list)
+        return po
 
 
 # ---------------- LAND PLOT ----------------
@@ -460,14 +994,9 @@ class LandPlot(models.Model):
     _order = "project_id, category, number"
 
     name = fields.Char(required=True)
+    active = fields.Boolean(default=True)
     project_id = fields.Many2one("land.project", required=True, ondelete="cascade")
-    category = fields.Selection([
-        ("r10", "Residential 10 Marla"),
-        ("r5", "Residential 5 Marla"),
-        ("c8", "Commercial 8 Marla"),
-        ("c4", "Commercial 4 Marla"),
-        ("sec", "Security"),
-    ], required=True)
+    category = fields.Selection(PLOT_CATEGORY_SELECTION, required=True, index=True)
     number = fields.Integer(string="No.", required=True)
     size_marla = fields.Float(string="Size (Marla)", readonly=True)
     cost = fields.Monetary(string="Cost", compute="_compute_cost", store=True, currency_field="currency_id")
@@ -481,16 +1010,24 @@ class LandPlot(models.Model):
     parent_plot_id = fields.Many2one("land.plot", string="Parent Plot", ondelete="set null")
 
     # attachments on plot level (binary base64 fields)
-    registry_attachment = fields.Binary(string="Registry Document")
-    fard_attachment = fields.Binary(string="Fard Document")
-    intiqal_attachment = fields.Binary(string="Intiqal Document")
+    registry_attachment = fields.Binary(string="Registry Document", attachment=True)
+    fard_attachment = fields.Binary(string="Fard Document", attachment=True)
+    intiqal_attachment = fields.Binary(string="Intiqal Document", attachment=True)
 
     registry_filename = fields.Char(string="Registry Filename")
     fard_filename = fields.Char(string="Fard Filename")
     intiqal_filename = fields.Char(string="Intiqal Filename")
 
     # optional product link once converted
-    product_id = fields.Many2one("product.product", string="Product")
+    product_id = fields.Many2one("product.product", string="Product", index="btree_not_null")
+
+    # availability, kept in sync by sale.order confirmation / cancellation
+    state = fields.Selection([
+        ("available", "Available"),
+        ("reserved", "Reserved"),
+        ("sold", "Sold"),
+    ], string="Status", default="available", required=True, copy=False)
+    sale_order_id = fields.Many2one("sale.order", string="Sale Order", copy=False, index="btree_not_null")
 
     # Unique constraint - keep for compatibility (warning in logs may remain on newer Odoo versions)
     _sql_constraints = [
@@ -499,32 +1036,98 @@ class LandPlot(models.Model):
     ]
 
 
-    @api.depends("category", "project_id.cost_per_marla", "is_security", "project_id.project_type",
-                 "project_id.security_pct")
+    def init(self):
+        # Partial index serving allocate_next_plot: only free plots are indexed,
+        # so finding the next one stays O(log n) however many plots are sold.
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS land_plot_available_idx
+                ON land_plot (project_id, category, is_security, number)
+             WHERE state = 'available' AND active
+        """)
+
+    # ---------------- Allocation ----------------
+    @api.model
+    def allocate_next_plot(self, project_id, category, is_security=False, sale_order_id=False):
+        """
+        Reserve and return the lowest numbered available plot of a project
+        category (empty recordset when none is left). Rows locked by a
+        concurrent allocation are skipped, so two salesmen never receive the
+        same plot.
+        """
+        self.flush_model(["project_id", "category", "is_security", "number", "state", "active"])
+        self.env.cr.execute("""
+            SELECT id
+              FROM land_plot
+             WHERE project_id = %s
+               AND category = %s
+               AND is_security = %s
+               AND state = 'available'
+               AND active
+          ORDER BY number
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """, (project_id, category, bool(is_security)))
+        row = self.env.cr.fetchone()
+        if not row:
+            return self.browse()
+        plot = self.browse(row[0])
+        plot.write({"state": "reserved", "sale_order_id": sale_order_id})
+        return plot
+
+    def action_release(self):
+        self.write({"state": "available", "sale_order_id": False})
+        return True
+
+    # ---------------- Used marla bookkeeping ----------------
+    def _marla_contributions(self):
+        """Marla each project gets from these plots (active, non-security plots only)."""
+        contributions = {}
+        for plot in self:
+            if plot.project_id and plot.active and not plot.is_security:
+                contributions[plot.project_id.id] = contributions.get(plot.project_id.id, 0.0) + (plot.size_marla or 0.0)
+        return contributions
+
+    @api.model
+    def _apply_used_marla_delta(self, before, after):
+        deltas = {
+            project_id: after.get(project_id, 0.0) - before.get(project_id, 0.0)
+            for project_id in set(before) | set(after)
+        }
+        projects = self.env["land.project"].browse([pid for pid, delta in deltas.items() if delta]).exists()
+        for project in projects:
+            project.used_marla = round(project.used_marla + deltas[project.id], 2)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._apply_used_marla_delta({}, records._marla_contributions())
+        return records
+
+    def write(self, vals):
+        if not MARLA_TRACKED_FIELDS & set(vals):
+            return super().write(vals)
+        before = self._marla_contributions()
+        res = super().write(vals)
+        self._apply_used_marla_delta(before, self._marla_contributions())
+        return res
+
+    def unlink(self):
+        before = self._marla_contributions()
+        res = super().unlink()
+        self._apply_used_marla_delta(before, {})
+        return res
+
+    # cost_per_marla changes are applied set-based by LandProject._reprice_plots
+    @api.depends("category", "is_security", "project_id")
     def _compute_cost(self):
+        price_tables = {}
         for rec in self:
-            base = rec.project_id.cost_per_marla or 0.0
-
-            if rec.category == "r10":
-                size_marla, premium = TEN_MARLA, 1.0
-            elif rec.category == "r5":
-                size_marla, premium = FIVE_MARLA, 1.0
-            elif rec.category == "c8":
-                size_marla, premium = EIGHT_MARLA_C, 1.2
-            elif rec.category == "c4":
-                size_marla, premium = FOUR_MARLA_C, 1.2
-            else:
-                size_marla, premium = 0.0, 1.0
+            project = rec.project_id
+            if project.id not in price_tables:
+                price_tables[project.id] = project._get_plot_price_table()
+            size_marla, cost, security_amount = price_tables[project.id].get(
+                (rec.category, bool(rec.is_security)), (0.0, 0.0, 0.0))
 
-            normal_cost = base * size_marla * premium
             rec.size_marla = size_marla
-
-            if rec.is_security:
-                # Calculate security amount as percentage of normal_cost
-                sec_pct = rec.project_id.security_pct or 0.0
-                security_amount = base * size_marla * premium
-                rec.security_amount = round(security_amount, 2)
-                rec.cost = round(security_amount, 2)  # If cost is only security amount
-            else:
-                rec.security_amount = 0.0
-                rec.cost = round(normal_cost, 2)
+            rec.security_amount = security_amount
+            rec.cost = cost
@@ -8,6 +8,8 @@ import logging
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
 
+from .plot_models import PLOT_CATEGORY_SELECTION
+
 _logger = logging.getLogger(__name__)
 
 
@@ -51,9 +53,47 @@ class ProductLand(models.Model):
         help="Links this product to a registered land plot record.",
     )
 
+    # Plot category, set once when the plot is converted to inventory
+    plot_category = fields.Selection(
+        PLOT_CATEGORY_SELECTION,
+        string="Plot Category",
+        index=True,
+        copy=False,
+        readonly=True,
+    )
+
     # NEW FIELD (requested)
     size_marla = fields.Char(string="Size (Marla)")
 
+    # Registry / Fard / Intiqal documents, shared with every product holding the same content
+    land_document_ids = fields.Many2many(
+        'ir.attachment',
+        'product_template_land_document_rel',
+        'product_tmpl_id',
+        'attachment_id',
+        string="Land Documents",
+    )
+
+    @api.model
+    def _backfill_plot_category(self):
+        """
+        Set plot_category on products converted before the field existed, from
+        their land plot; security charge products get "sec".
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            UPDATE product_template pt
+               SET plot_category = CASE WHEN lp.is_security THEN 'sec' ELSE lp.category END
+              FROM land_plot lp
+              JOIN product_product pp ON pp.id = lp.product_id
+             WHERE pp.product_tmpl_id = pt.id
+               AND pt.plot_category IS DISTINCT FROM
+                   CASE WHEN lp.is_security THEN 'sec' ELSE lp.category END
+        """)
+        if self.env.cr.rowcount:
+            _logger.info("Backfilled plot_category on %s products", self.env.cr.rowcount)
+        self.invalidate_model(['plot_category'])
+
     # -------------------------------
     # COMPUTE METHODS
     # -------------------------------
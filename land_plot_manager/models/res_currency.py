@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Currency Extensions
+Cached amount-in-words conversion shared by sale orders and invoices
+"""
+import itertools
+import threading
+from collections import OrderedDict
+
+from odoo import api, models, tools
+
+
+class AmountWordsCache:
+    """
+    Bounded LRU cache of amount_to_text results keyed by
+    (database, generation, currency, amount, language), with hit/miss counters.
+
+    The cache lives in each worker process; the generation comes from an
+    ormcached method, so clearing the registry cache after a currency change
+    moves every worker to a new generation and their stale entries are no
+    longer reached (they age out of the LRU).
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+amount_words_cache = AmountWordsCache()
+_generations = itertools.count()
+
+# res.currency fields that change the wording of an amount
+AMOUNT_WORDS_FIELDS = {"name", "rounding", "decimal_places", "currency_unit_label", "currency_subunit_label"}
+
+
+class ResCurrency(models.Model):
+    _inherit = "res.currency"
+
+    def _amount_to_text_cached(self, amount):
+        """amount_to_text through the shared LRU cache, in the language of the environment."""
+        self.ensure_one()
+        amount = self.round(amount or 0.0)
+        key = (self.env.cr.dbname, self._get_amount_words_generation(), self.id, amount,
+               self.env.lang or "en_US")
+        text = amount_words_cache.get(key)
+        if text is None:
+            text = self.amount_to_text(amount)
+            amount_words_cache.put(key, text)
+        return text
+
+    @api.model
+    @tools.ormcache()
+    def _get_amount_words_generation(self):
+        """Generation of the amount-in-words cache, renewed whenever the registry cache is cleared."""
+        return next(_generations)
+
+    @api.model
+    def get_amount_words_cache_stats(self):
+        return amount_words_cache.stats()
+
+    def write(self, vals):
+        res = super().write(vals)
+        if AMOUNT_WORDS_FIELDS.intersection(vals):
+            amount_words_cache.clear()
+            # signals the other workers, which then move to a new generation
+            self.env.registry.clear_cache()
+        return res
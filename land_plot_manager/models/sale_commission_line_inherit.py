@@ -3,6 +3,8 @@ from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 import logging
 
+from .land_commission_rate import COMMISSION_CATEGORIES
+
 _logger = logging.getLogger(__name__)
 
 
@@ -14,6 +16,7 @@ class LandPlotCommission(models.Model):
     # =========================
     #   Constants
     # =========================
+    # Built-in rates, used when no land.commission.rate is effective yet
     COMMISSION_CATEGORY_MAP = {
         'r5': {'name': 'Residential 5 Marla', 'extra_amount': 200000.0, 'commission_1': 130000.0},
         'r10': {'name': 'Residential 10 Marla', 'extra_amount': 300000.0, 'commission_1': 195000.0},
@@ -27,14 +30,11 @@ class LandPlotCommission(models.Model):
     #   Fields
     # =========================
     name = fields.Char(default=lambda self: _('New'), readonly=True, copy=False)
-    commission_category = fields.Selection([
-        ('r5', 'Residential 5 Marla'),
-        ('r10', 'Residential 10 Marla'),
-        ('c4', 'Commercial 4 Marla'),
-        ('c8', 'Commercial 8 Marla'),
-    ], string="Commission Category", required=True)
+    commission_category = fields.Selection(COMMISSION_CATEGORIES, string="Commission Category", required=True)
 
     sale_price = fields.Monetary(string="Sale Price", currency_field="currency_id", required=True)
+    commission_date = fields.Date(string="Commission Date", index=True, copy=False,
+                                  help="Date deciding which commission rate applies.")
     extra_amount = fields.Monetary(string="Padding Amount", compute="_compute_extra_amount", store=True)
     variable_commission_base = fields.Monetary(string="Variable Base", compute="_compute_variable_base", store=True)
     commission_1 = fields.Monetary(string="65% Padding Commission", compute="_compute_commission_values", store=True)
@@ -55,31 +55,54 @@ class LandPlotCommission(models.Model):
     # Link back to sale/order origin if available
     origin = fields.Char(string='Origin (Sale)', readonly=True, copy=False)
 
+    # Periodic settlement that billed this commission (settlement billing mode)
+    settlement_id = fields.Many2one('land.commission.settlement', string='Settlement',
+                                    readonly=True, copy=False, index='btree_not_null')
+
+    # Set when a rate change would alter a commission that is already billed
+    rate_outdated = fields.Boolean(string="Rate Changed After Billing", readonly=True, copy=False)
+
     # =========================
     #   Computed Fields
     # =========================
-    @api.depends('commission_category')
+    def _get_rate_values(self):
+        self.ensure_one()
+        return self.env['land.commission.rate']._get_rate_values(
+            self.commission_category, self.commission_date or (self.create_date and self.create_date.date()))
+
+    @api.depends('commission_category', 'commission_date')
     def _compute_extra_amount(self):
         for rec in self:
-            data = self.COMMISSION_CATEGORY_MAP.get(rec.commission_category)
-            rec.extra_amount = data['extra_amount'] if data else 0.0
+            values = rec._get_rate_values()
+            rec.extra_amount = values[0] if values else 0.0
 
     @api.depends('sale_price', 'extra_amount')
     def _compute_variable_base(self):
         for rec in self:
             rec.variable_commission_base = max(0.0, (rec.sale_price or 0.0) - (rec.extra_amount or 0.0))
 
-    @api.depends('commission_category', 'variable_commission_base')
+    @api.depends('commission_category', 'commission_date', 'variable_commission_base')
     def _compute_commission_values(self):
         for rec in self:
-            data = self.COMMISSION_CATEGORY_MAP.get(rec.commission_category)
-            if data:
-                rec.commission_1 = data['commission_1']
-                rec.commission_2 = round((rec.variable_commission_base or 0.0) * self.COMMISSION_RATE, 2)
+            values = rec._get_rate_values()
+            if values:
+                _extra_amount, commission_1, rate = values
+                rec.commission_1 = commission_1
+                rec.commission_2 = round((rec.variable_commission_base or 0.0) * rate, 2)
                 rec.commission_total = rec.commission_1 + rec.commission_2
             else:
                 rec.commission_1 = rec.commission_2 = rec.commission_total = 0.0
 
+    @api.model
+    def _backfill_commission_date(self):
+        """Date the commissions created before commission_date existed by their creation date."""
+        self.env.cr.execute("""
+            UPDATE land_plot_commission
+               SET commission_date = create_date::date
+             WHERE commission_date IS NULL
+        """)
+        self.invalidate_model(['commission_date'])
+
     # =========================
     #   Invoice Auto-Creation
     # =========================
@@ -90,62 +113,113 @@ class LandPlotCommission(models.Model):
             vals_list = [vals_list]
         
         # Generate sequence numbers for name field if not provided
+        today = fields.Date.context_today(self)
         for vals in vals_list:
             if not vals.get('name') or vals.get('name') == 'New':
                 vals['name'] = self.env['ir.sequence'].next_by_code('land.plot.commission') or 'New'
+            vals.setdefault('commission_date', today)
         
         records = super().create(vals_list)
-        for rec in records:
-            # Auto-create draft supplier bill for commission
-            rec._auto_create_invoice()
+        # Auto-create draft supplier bills for the new commissions, unless they
+        # are billed by the periodic settlement (land.commission.settlement)
+        if self._get_billing_mode() == 'per_commission':
+            records._create_commission_bills()
         return records
 
-    def _auto_create_invoice(self):
-        """Automatically create a draft supplier bill for this commission."""
-        self.ensure_one()
-        if not self.commission_total:
-            return False
+    @api.model
+    def _get_billing_mode(self):
+        """'per_commission' (one bill per commission at creation) or 'settlement' (periodic bill per partner)."""
+        return self.env['ir.config_parameter'].sudo().get_param(
+            'land_plot_manager.commission_billing', 'per_commission')
 
-        partner = self.commission_partner_id or self.env.company.partner_id
-
-        # Create/find a product named 'Commission Service'
-        product = self.env['product.product'].search([('name', '=', 'Commission Service')], limit=1)
+    @api.model
+    def _get_commission_product(self):
+        """The 'Commission Service' product, resolved through its XML-ID (cached by ir.model.data)."""
+        product = self.env.ref('land_plot_manager.product_commission_service', raise_if_not_found=False)
+        if not product:
+            # data record deleted: fall back to the legacy lookup by name
+            product = self.env['product.product'].search([('name', '=', 'Commission Service')], limit=1)
         if not product:
             product = self.env['product.product'].create({
                 'name': 'Commission Service',
                 'type': 'service',
                 'list_price': 0.0,
             })
+        return product
+
+    @api.model
+    def _bind_commission_product_xmlid(self):
+        """
+        Adopt the 'Commission Service' product created by name on existing
+        databases under the product_commission_service XML-ID, so the data
+        record does not create a second one.
+        """
+        if self.env.ref('land_plot_manager.product_commission_service', raise_if_not_found=False):
+            return
+        product = self.env['product.product'].with_context(active_test=False).search(
+            [('name', '=', 'Commission Service')], order='id', limit=1)
+        if product:
+            self.env['ir.model.data'].create({
+                'module': 'land_plot_manager',
+                'name': 'product_commission_service',
+                'model': 'product.product',
+                'res_id': product.id,
+                'noupdate': True,
+            })
 
-        line_vals = {
-            'name': product.name,
-            'product_id': product.id,
-            'quantity': 1.0,
-            'price_unit': self.commission_total,
-        }
-
-        move_vals = {
+    def _prepare_bill_vals(self, product):
+        self.ensure_one()
+        partner = self.commission_partner_id or self.env.company.partner_id
+        return {
             'move_type': 'in_invoice',
             'partner_id': partner.id,
-            'invoice_line_ids': [(0, 0, line_vals)],
+            'invoice_line_ids': [(0, 0, {
+                'name': product.name,
+                'product_id': product.id,
+                'quantity': 1.0,
+                'price_unit': self.commission_total,
+            })],
             'currency_id': self.currency_id.id,
         }
 
-        move = self.env['account.move'].create(move_vals)
-        self.commission_invoice_id = move.id
-        _logger.info(f"✅ Auto-created draft commission invoice {move.name or move.id} for {self.name}")
-        return move
+    def _create_commission_bills(self):
+        """
+        Create one draft supplier bill per commission without a bill, for the
+        whole batch: one product lookup, one multi-create of the moves, and the
+        links back written through the ORM and flushed together.
+        """
+        commissions = self.filtered(lambda c: c.commission_total and not c.commission_invoice_id)
+        if not commissions:
+            return self.env['account.move']
+
+        product = self._get_commission_product()
+        moves = self.env['account.move'].create([rec._prepare_bill_vals(product) for rec in commissions])
+
+        # one ORM write per commission; the flush sends them as one batched UPDATE
+        # and recomputes the stored invoice_state
+        for commission, move in zip(commissions, moves):
+            commission.commission_invoice_id = move
+        _logger.info("✅ Auto-created %s draft commission invoices", len(moves))
+        return moves
+
+    def _auto_create_invoice(self):
+        """Automatically create a draft supplier bill for this commission."""
+        self.ensure_one()
+        return self._create_commission_bills()
 
     # =========================
     #   Actions
     # =========================
     def action_confirm_invoice(self):
-        """Confirm (post) the linked draft invoice."""
-        for rec in self:
-            if rec.commission_invoice_id and rec.commission_invoice_id.state == 'draft':
-                rec.commission_invoice_id.action_post()
+        """Confirm (post) the linked draft invoices, each shared settlement bill once."""
+        self.commission_invoice_id.filtered(lambda m: m.state == 'draft').action_post()
         return True
 
+    def action_settle(self):
+        """Bill the selected unsettled commissions now, one bill per partner and currency."""
+        settlements = self.env['land.commission.settlement']._settle(self)
+        return settlements._get_action()
+
 
 # ------------------------------------------------------------------
 # Hook into account.move posting so we can detect when the relevant
@@ -158,84 +232,28 @@ class AccountMove(models.Model):
     def action_post(self):
         res = super(AccountMove, self).action_post()
 
-        # After posting invoice(s), check origin grouping
-        for move in self:
-            origin = (move.invoice_origin or '').strip()
-            # Only proceed if there is an origin (usually sale order name)
-            if not origin:
-                continue
-
-            # Find posted customer invoices with same origin
-            domain = [
-                ('invoice_origin', '=', origin),
-                ('state', '=', 'posted'),
-                ('move_type', '=', 'out_invoice'),
-            ]
-            posted_moves = self.env['account.move'].search(domain)
-
-            # Heuristic: consider commission eligible when there are at least 2 posted customer invoices
-            # for the same origin (commonly: a downpayment + a confirmation invoice).
-            if len(posted_moves) < 2:
-                continue
-
-            # Avoid duplicate commission records for the same origin
-            existing = self.env['land.plot.commission'].search([('origin', '=', origin)], limit=1)
-            if existing:
-                continue
-
-            # Try to detect sale order to get better data
-            sale = self.env['sale.order'].search([('name', '=', origin)], limit=1)
-
-            # Determine sale_price (fall back to largest posted invoice amount)
-            sale_price = 0.0
-            if sale:
-                sale_price = sale.amount_total or 0.0
-            else:
-                for m in posted_moves:
-                    sale_price = max(sale_price, m.amount_total or 0.0)
-
-            # Try to detect commission_category from sale.order lines product names
-            commission_category = 'r5'  # default
-            if sale:
-                found = False
-                for line in sale.order_line:
-                    pname = (line.product_id.name or '').lower()
-                    if '5 marla' in pname or '5-marla' in pname or 'r5' in pname:
-                        commission_category = 'r5'
-                        found = True
-                        break
-                    if '10 marla' in pname or '10-marla' in pname or 'r10' in pname:
-                        commission_category = 'r10'
-                        found = True
-                        break
-                    if '4 marla' in pname or '4-marla' in pname or 'c4' in pname:
-                        commission_category = 'c4'
-                        found = True
-                        break
-                    if '8 marla' in pname or '8-marla' in pname or 'c8' in pname:
-                        commission_category = 'c8'
-                        found = True
-                        break
-                # If sale has an explicit field (custom) named commission_category, prefer it
-                if not found and hasattr(sale, 'commission_category') and sale.commission_category:
-                    commission_category = sale.commission_category
-
-            partner = move.partner_id or (sale.partner_id if sale else None) or self.env.company.partner_id
-            currency = move.currency_id or (sale.currency_id if sale else self.env.company.currency_id)
-
-            vals = {
-                'name': origin,
-                'origin': origin,
-                'commission_category': commission_category,
-                'sale_price': sale_price,
-                'commission_partner_id': partner.id if partner else False,
-                'currency_id': currency.id if currency else False,
-            }
-
-            try:
-                created = self.env['land.plot.commission'].create(vals)
-                _logger.info(f"✅ Created commission record (auto) for origin {origin}: {created.id}")
-            except Exception as e:
-                _logger.exception(f"Failed to auto-create commission for origin {origin}: {e}")
+        # Sale orders of the posted customer invoices; eligibility (two posted
+        # invoices, no existing commission) is checked for all of them at once.
+        sales = self.filtered(lambda m: m.move_type == 'out_invoice').sale_id
+        if not sales:
+            return res
+
+        try:
+            with self.env.cr.savepoint():
+                created = sales._create_commissions()[0]
+        except Exception as e:
+            # one bad order must not drop the commissions of the others:
+            # retry order by order, each in its own savepoint
+            _logger.warning(f"Batched commission creation failed for {', '.join(sales.mapped('name'))}, "
+                            f"retrying per order: {e}")
+            created = self.env['land.plot.commission']
+            for sale in sales:
+                try:
+                    with self.env.cr.savepoint():
+                        created |= sale._create_commissions()[0]
+                except Exception as e:
+                    _logger.exception(f"Failed to auto-create commission for origin {sale.name}: {e}")
+        for commission in created:
+            _logger.info(f"✅ Created commission record (auto) for origin {commission.origin}: {commission.id}")
 
         return res
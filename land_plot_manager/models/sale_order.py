@@ -4,10 +4,16 @@ Sale Order Extensions
 Adds land plot specific fields and functionality
 """
 import logging
+import time
 from odoo import api, fields, models, _
 from odoo.tools.safe_eval import safe_eval
 from odoo.exceptions import UserError, ValidationError
 
+from .plot_models import INVENTORY_CATEGORY_MAP
+
+# product category name -> plot category, for products with no plot_category
+PRODUCT_CATEGORY_TO_PLOT = {name: code for code, name in INVENTORY_CATEGORY_MAP.items()}
+
 _logger = logging.getLogger(__name__)
 
 
@@ -52,10 +58,12 @@ class SaleOrder(models.Model):
     )
 
 
-    @api.depends('amount_total')
+    @api.depends('amount_total', 'currency_id')
     def _compute_amount_in_words(self):
         for rec in self:
-            rec.amount_total_in_words = rec.currency_id.amount_to_text(rec.amount_total)
+            rec.amount_total_in_words = (
+                rec.currency_id._amount_to_text_cached(rec.amount_total) if rec.currency_id else ""
+            )
 
 
     # ----------------------------------------------------------
@@ -78,48 +86,96 @@ class SaleOrder(models.Model):
         """
         Generate allotment number based on product name
         Format: PRODUCT-NAME-### (e.g., RES-10_001-001)
+        The number comes from the per-prefix allotment counter; an order keeps
+        its number as long as its first product does not change.
         """
+        Counter = self.env['land.allotment.counter']
         for order in self:
             if order.order_line:
                 product_name = order.order_line[0].product_id.name or "SO"
-                # Count how many allotments exist with same product prefix
-                existing_count = self.search_count([
-                    ('allotment_no', 'like', f"{product_name}-%")
-                ])
-                order.allotment_no = f"{product_name}-{str(existing_count + 1).zfill(3)}"
+                if order.allotment_no and order.allotment_no.rsplit('-', 1)[0] == product_name:
+                    continue
+                next_number = Counter._next_number(product_name)
+                order.allotment_no = f"{product_name}-{str(next_number).zfill(3)}"
 
     # ----------------------------------------------------------
     # Invoice Helpers
     # ----------------------------------------------------------
     @api.depends('state')
     def _compute_any_invoice_exists(self):
-        Move = self.env['account.move']
+        counts = self._get_invoice_counts()
         for so in self:
-            so.any_invoice_exists = bool(Move.search_count(so._invoice_domain_all_for_self()))
+            so.any_invoice_exists = bool(counts.get(so.id))
+
+    def _get_invoice_counts(self):
+        """
+        Number of invoices/credit notes of each order in the batch: {order_id: count}.
+        One grouped query on sale_id, plus one for the invoices spanning several
+        orders, which have no sale_id and are linked through their lines.
+        """
+        order_ids = [oid for oid in self.ids if isinstance(oid, int)]
+        if not order_ids:
+            return {}
+        query_count = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        groups = self.env['account.move']._read_group(
+            [
+                ('sale_id', 'in', order_ids),
+                ('move_type', 'in', ['out_invoice', 'out_refund']),
+                ('state', 'in', ['draft', 'posted']),
+            ],
+            ['sale_id'], ['__count'],
+        )
+        counts = {order.id: count for order, count in groups}
+
+        # invoices spanning several orders keep sale_id empty: count them through their lines
+        self.env['account.move'].flush_model(['sale_id', 'move_type', 'state'])
+        self.env['account.move.line'].flush_model(['move_id', 'sale_line_ids'])
+        self.env.cr.execute("""
+            SELECT sol.order_id, COUNT(DISTINCT am.id)
+              FROM account_move am
+              JOIN account_move_line aml ON aml.move_id = am.id
+              JOIN sale_order_line_invoice_rel rel ON rel.invoice_line_id = aml.id
+              JOIN sale_order_line sol ON sol.id = rel.order_line_id
+             WHERE am.sale_id IS NULL
+               AND am.move_type IN ('out_invoice', 'out_refund')
+               AND am.state IN ('draft', 'posted')
+               AND sol.order_id = ANY(%s)
+          GROUP BY sol.order_id
+        """, [order_ids])
+        for order_id, count in self.env.cr.fetchall():
+            counts[order_id] = counts.get(order_id, 0) + count
+
+        # benchmark: stays at two queries whatever the number of orders
+        _logger.debug(
+            "Invoice counts of %s orders in %s queries (%.3fs)",
+            len(order_ids), self.env.cr.sql_log_count - query_count, time.perf_counter() - started,
+        )
+        return counts
 
     def _invoice_domain_all_for_self(self):
         """
-        Show ALL invoices tied to the SO:
-        - via direct link: sale_id = SO
-        - via invoice line links: invoice_line_ids.sale_line_ids.order_id = SO
-        - via origin name: invoice_origin = SO.name
+        Show ALL invoices tied to the SO through sale_id, which account.move
+        keeps up to date on every invoicing path. Invoices spanning several
+        orders have no sale_id and are found through their lines.
         Include drafts & posted, invoices & credit notes.
         """
         self.ensure_one()
         return [
-            ('move_type', 'in', ['out_invoice', 'out_refund']),
-            ('state', 'in', ['draft', 'posted']),
-            '|', '|',
+            '|',
             ('sale_id', '=', self.id),
+            '&',
+            ('sale_id', '=', False),
             ('invoice_line_ids.sale_line_ids.order_id', '=', self.id),
-            ('invoice_origin', '=', self.name),
+            ('move_type', 'in', ['out_invoice', 'out_refund']),
+            ('state', 'in', ['draft', 'posted']),
         ]
 
     def _get_invoiced(self):
         super()._get_invoiced()
-        Move = self.env['account.move']
+        counts = self._get_invoice_counts()
         for so in self:
-            so.invoice_count = Move.search_count(so._invoice_domain_all_for_self())
+            so.invoice_count = counts.get(so.id, 0)
 
     # ----------------------------------------------------------
     # Helper functions for actions
@@ -187,6 +243,14 @@ class SaleOrder(models.Model):
         report = self.env.ref('land_plot_manager.challan_report_action')
         return report.report_action(self)
 
+    def action_bulk_print_final_file(self):
+        """Render the final files of the selected orders in the background, as one ZIP."""
+        return self.env['land.print.job']._enqueue('land_plot_manager.action_report_final_file', self)
+
+    def action_bulk_print_sale_user(self):
+        """Render the sale reports of the selected orders in the background, as one ZIP."""
+        return self.env['land.print.job']._enqueue('land_plot_manager.action_report_sale_user', self)
+
     def action_print_installment_letter(self):
         """Print the Installment Letter report as PDF."""
         self.ensure_one()
@@ -194,17 +258,31 @@ class SaleOrder(models.Model):
         if not report:
             raise UserError(_("Installment letter report not found. Please reinstall the module."))
 
-        AccountMove = self.env['account.move']
-        invoices = AccountMove.search([
-            '|', '|',
-            ('invoice_origin', '=', self.name),
-            ('invoice_line_ids.sale_line_ids.order_id', '=', self.id),
-            ('partner_id', '=', self.partner_id.id),
-            ('move_type', '=', 'out_invoice')
-        ])
+        # the installment schedule is loaded by the report model (_get_installment_schedule)
+        return report.report_action(self)
 
-        ctx = dict(self.env.context, inv_item=invoices)
-        return report.report_action(self.with_context(ctx))
+    def _get_installment_schedule(self):
+        """
+        Installment invoices of the orders per order id, sorted by due date.
+        One indexed query (account_move_sale_installment_idx) for the whole batch;
+        each row carries its amounts and a precomputed paid flag.
+        """
+        schedule = {order.id: [] for order in self}
+        if not self.ids:
+            return schedule
+        moves = self.env['account.move'].search_read(
+            [('sale_id', 'in', self.ids),
+             ('move_type', '=', 'out_invoice'),
+             ('custom_method', '=', 'installment'),
+             ('state', '!=', 'cancel')],
+            ['sale_id', 'name', 'invoice_date', 'invoice_date_due',
+             'amount_untaxed', 'amount_total', 'amount_residual', 'payment_state'],
+            order='invoice_date_due asc, id asc',
+        )
+        for move in moves:
+            move['paid'] = move['payment_state'] in ('paid', 'in_payment', 'reversed')
+            schedule[move.pop('sale_id')[0]].append(move)
+        return schedule
 
     def action_print_payment_acknowledgement(self):
         """Print appropriate payment acknowledgement based on plan_type."""
@@ -253,111 +331,208 @@ class SaleOrder(models.Model):
         return report.report_action(self)
 
     def action_confirm(self):
-        """Override to send email when sale order is confirmed."""
+        """Override to queue the confirmation email; it is sent by the mail queue worker."""
         result = super(SaleOrder, self).action_confirm()
-        
-        # Send confirmation email to customer
-        for order in self:
-            if order.partner_id and order.partner_id.email:
-                try:
-                    template = self.env.ref('land_plot_manager.email_template_sale_order_confirmed', raise_if_not_found=False)
-                    if template:
-                        mail_id = template.send_mail(order.id, force_send=True)
-                        if mail_id:
-                            order.message_post(
-                                body=_("Confirmation email sent to %s - Your request has been approved") % order.partner_id.email,
-                                subject=_("Sale Order Confirmed")
-                            )
-                        _logger.info(f"Confirmation email sent to {order.partner_id.email} for sale order {order.name}")
-                except Exception as e:
-                    _logger.error(f"Error sending confirmation email: {str(e)}")
-        
+        self._mark_plots_sold()
+
+        # Queue confirmation email to customer
+        self.env['land.mail.job']._enqueue(
+            'sale_confirmation', self.filtered(lambda o: o.partner_id and o.partner_id.email))
+
         return result
 
-    def action_create_commission(self):
+    # ----------------------------------------------------------
+    # Plot availability
+    # ----------------------------------------------------------
+    def _action_cancel(self):
+        res = super()._action_cancel()
+        self._release_plots()
+        return res
+
+    def _mark_plots_sold(self):
+        """
+        Mark the plots sold through these orders (matched by product) as sold.
+        The plot rows are locked first, so two orders confirming concurrently
+        cannot both claim a plot: a plot already sold or held by another order
+        raises a UserError.
+        """
+        orders_by_product = {}
+        for order in self:
+            for product in order.order_line.product_id:
+                orders_by_product.setdefault(product.id, []).append(order)
+        if not orders_by_product:
+            return
+
+        self.env['land.plot'].flush_model(['product_id', 'state', 'sale_order_id', 'active'])
+        self.env.cr.execute("""
+            SELECT id, name, product_id, state, sale_order_id
+              FROM land_plot
+             WHERE product_id = ANY(%s) AND active
+               FOR UPDATE
+        """, [list(orders_by_product)])
+        conflicts = []
+        plot_ids_by_order = {}
+        for plot_id, name, product_id, state, sale_order_id in self.env.cr.fetchall():
+            orders = orders_by_product[product_id]
+            order = orders[0]
+            if len(orders) > 1:
+                conflicts.append(_("%s (in %s)") % (name, ", ".join(o.name for o in orders)))
+            elif state == 'sold' and sale_order_id != order.id:
+                conflicts.append(_("%s (already sold)") % name)
+            elif state == 'reserved' and sale_order_id and sale_order_id != order.id:
+                conflicts.append(_("%s (reserved by another order)") % name)
+            else:
+                plot_ids_by_order.setdefault(order.id, []).append(plot_id)
+        if conflicts:
+            raise UserError(_("These plots are not available for confirmation:\n%s") % "\n".join(conflicts))
+
+        Plot = self.env['land.plot']
+        for order_id, plot_ids in plot_ids_by_order.items():
+            Plot.browse(plot_ids).write({'state': 'sold', 'sale_order_id': order_id})
+
+    def _release_plots(self):
+        self.env['land.plot'].search([('sale_order_id', 'in', self.ids)]).action_release()
+
+    def _get_commission_category(self):
         """
-        Create commission record for sale order.
+        Commission category of the order, from the plot category of its first
+        plot product; security charge products (plot_category "sec") are skipped.
+        Products without a plot_category (e.g. created by hand) fall back to
+        their product category name.
+        """
+        self.ensure_one()
+        for product in self.order_line.product_id:
+            category = product.plot_category or PRODUCT_CATEGORY_TO_PLOT.get(product.categ_id.name)
+            if category and category != 'sec':
+                return category
+        return 'r5'  # default
 
-        Requires at least two posted customer invoices linked to the sale (invoice_origin = sale.name).
-        Raises a UserError with details if not satisfied.
+    def _prepare_commission_vals(self, max_invoice_amount=0.0):
+        self.ensure_one()
+        return {
+            'name': self.name,
+            'origin': self.name,
+            'commission_category': self._get_commission_category(),
+            # fall back to the largest posted invoice when the order has no total
+            'sale_price': self.amount_total or max_invoice_amount,
+            'commission_partner_id': self.partner_id.id,
+            'currency_id': (self.pricelist_id.currency_id.id
+                            if self.pricelist_id
+                            else (self.company_id.currency_id.id
+                                  if self.company_id
+                                  else self.env.company.currency_id.id)),
+        }
+
+    def _get_posted_invoice_stats(self):
+        """
+        Posted customer invoices per order id, as (count, largest amount),
+        for the whole batch in one grouped query.
+        """
+        if not self.ids:
+            return {}
+        groups = self.env['account.move']._read_group(
+            [('sale_id', 'in', self.ids), ('state', '=', 'posted'), ('move_type', '=', 'out_invoice')],
+            ['sale_id'], ['__count', 'amount_total:max'],
+        )
+        return {sale.id: (count, max_amount) for sale, count, max_amount in groups}
+
+    def _create_commissions(self):
+        """
+        Create the commission records of the eligible orders with one multi-create.
+
+        An order is eligible once it has at least two posted customer invoices
+        linked to it (sale_id, commonly a downpayment and a confirmation invoice)
+        and no commission with its name as origin exists yet.
+        Returns (created commissions, skipped orders, ineligible orders, existing
+        commission id per order name).
         """
         Commission = self.env['land.plot.commission']
+        invoice_stats = self._get_posted_invoice_stats()
+        existing = {
+            rec['origin']: rec['id']
+            for rec in Commission.search_read([('origin', 'in', self.mapped('name'))], ['origin'])
+        }
 
+        vals_list = []
+        skipped = self.browse()
+        ineligible = self.browse()
         for order in self:
-            invoices = self.env['account.move'].search([('invoice_origin', '=', order.name)])
-            posted = invoices.filtered(lambda m: m.state == 'posted' and m.move_type == 'out_invoice')
-
-            # If we don't have 2 posted customer invoices, raise a detailed error
-            if len(posted) < 2:
-                if not invoices:
-                    raise UserError(_(
-                        "Commission cannot be created because there are no invoices linked to this sale (origin: %s).\n"
-                        "Please create and validate the downpayment and confirmation invoices first."
-                    ) % order.name)
-
-                msgs = [_("Found %d invoice(s) linked to this sale.\n") % len(invoices)]
-                for inv in invoices:
-                    msgs.append(_("- %s : state = %s, amount = %s\n") %
-                                (inv.name or _('(no name)'), inv.state, inv.amount_total))
-
-                msgs.append(_(
-                    "\nYou need at least two posted customer invoices (downpayment + confirmation).\n"
-                    "Please post the following draft invoices first."
-                ))
-                raise UserError(''.join(msgs))
-
-            # Avoid duplicate commission records for this origin
-            existing = Commission.search([('origin', '=', order.name)], limit=1)
-            if existing:
-                # open existing record
-                return {
-                    'type': 'ir.actions.act_window',
-                    'res_model': 'land.plot.commission',
-                    'res_id': existing.id,
-                    'view_mode': 'form',
-                    'target': 'current',
-                }
-
-            # Map product category name to commission_category code
-            category_map = {
-                'Residential 5 Marla': 'r5',
-                'Residential 10 Marla': 'r10',
-                'Commercial 4 Marla': 'c4',
-                'Commercial 8 Marla': 'c8',
-            }
-
-            commission_category = 'r5'  # default
-            for line in order.order_line:
-                cat = line.product_id.categ_id.name if line.product_id and line.product_id.categ_id else False
-                if cat and cat in category_map:
-                    commission_category = category_map[cat]
-                    break
-
-            vals = {
-                'name': order.name,
-                'origin': order.name,
-                'commission_category': commission_category,
-                'sale_price': order.amount_total,
-                'commission_partner_id': order.partner_id.id,
-                'currency_id': (order.pricelist_id.currency_id.id
-                                if order.pricelist_id
-                                else (order.company_id.currency_id.id
-                                      if order.company_id
-                                      else self.env.company.currency_id.id)),
-            }
+            count, max_amount = invoice_stats.get(order.id, (0, 0.0))
+            if count < 2:
+                ineligible |= order
+            elif order.name in existing:
+                skipped |= order
+            else:
+                vals_list.append(order._prepare_commission_vals(max_amount))
+                # guard against the same order twice in the batch
+                existing[order.name] = False
+
+        return Commission.create(vals_list), skipped, ineligible, existing
+
+    def _raise_commission_ineligible(self):
+        """Explain why this order cannot get a commission yet."""
+        self.ensure_one()
+        invoices = self.env['account.move'].search([('sale_id', '=', self.id)])
+        if not invoices:
+            raise UserError(_(
+                "Commission cannot be created because there are no invoices linked to this sale (origin: %s).\n"
+                "Please create and validate the downpayment and confirmation invoices first."
+            ) % self.name)
+
+        msgs = [_("Found %d invoice(s) linked to this sale.\n") % len(invoices)]
+        for inv in invoices:
+            msgs.append(_("- %s : state = %s, amount = %s\n") %
+                        (inv.name or _('(no name)'), inv.state, inv.amount_total))
+
+        msgs.append(_(
+            "\nYou need at least two posted customer invoices (downpayment + confirmation).\n"
+            "Please post the following draft invoices first."
+        ))
+        raise UserError(''.join(msgs))
 
-            commission = Commission.create(vals)
-            order.message_post(body=_("Commission %s created.") % commission.name)
+    def action_create_commission(self):
+        """
+        Create commission records for the selected sale orders.
 
+        An order is eligible once it has at least two posted customer invoices
+        linked to it (sale_id). Orders that already have a commission are skipped.
+        For a single order the commission form is opened (or a detailed UserError
+        raised); for a batch a summary of created, skipped and ineligible orders
+        is shown.
+        """
+        commissions, skipped, ineligible, existing = self._create_commissions()
+        orders_by_name = {order.name: order for order in self}
+        for commission in commissions:
+            orders_by_name[commission.origin].message_post(body=_("Commission %s created.") % commission.name)
+
+        if len(self) == 1:
+            if ineligible:
+                ineligible._raise_commission_ineligible()
             return {
                 'type': 'ir.actions.act_window',
                 'res_model': 'land.plot.commission',
-                'res_id': commission.id,
+                'res_id': commissions.id or existing[self.name],
                 'view_mode': 'form',
                 'target': 'current',
             }
 
-        return True
+        _logger.info("Commission batch: %d created, %d skipped, %d ineligible",
+                     len(commissions), len(skipped), len(ineligible))
+        lines = [_("Created: %d") % len(commissions)]
+        if skipped:
+            lines.append(_("Skipped (commission exists): %s") % ', '.join(skipped.mapped('name')))
+        if ineligible:
+            lines.append(_("Ineligible (fewer than two posted invoices): %s") % ', '.join(ineligible.mapped('name')))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Commissions"),
+                'message': '\n'.join(lines),
+                'type': 'warning' if ineligible else 'success',
+                'sticky': bool(ineligible or skipped),
+            },
+        }
 
     class AccountMove(models.Model):
         _inherit = 'account.move'
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Sale Order Report Data
+Loads what the sale order QWeb reports need for the whole batch up front
+"""
+from collections import defaultdict
+
+from odoo import api, models
+
+# Installments listed per order on the installment letter
+REPORT_INVOICE_LIMIT = 50
+
+# Partner fields read by the reports (nominee block, contact block, picture)
+REPORT_PARTNER_FIELDS = [
+    "name", "relation", "relative_name", "cnic", "email", "street", "phone", "mobile",
+    "nominee_name", "relation_1", "relative_name_1", "nominee_cnic", "application", "image_1920",
+]
+
+
+class LandSaleOrderReport(models.AbstractModel):
+    """
+    Base report model for the sale order reports.
+    Fills the record cache for all printed orders with a few batched reads and
+    hands the templates per-order plain data (plot sizes, plot names,
+    installment schedule, paid amounts), so rendering many orders does not fall back to per-record queries.
+    """
+    _name = "land.sale.order.report"
+    _description = "Sale Order Report Data"
+
+    @api.model
+    def _get_report_values(self, docids, data=None):
+        docs = self.env["sale.order"].browse(docids)
+        docs.fetch(["name", "partner_id", "company_id", "date_order", "allotment_no", "reg_number",
+                    "amount_total", "plan_type", "land_project_id"])
+        docs.land_project_id.fetch(["name"])
+        docs.partner_id.fetch(REPORT_PARTNER_FIELDS)
+        docs.company_id.fetch(["name", "street", "city", "state_id", "country_id", "phone", "logo"])
+        lines = docs.order_line
+        lines.fetch(["order_id", "product_id", "name", "product_uom_qty", "price_unit", "price_subtotal"])
+        lines.product_id.fetch(["product_tmpl_id", "default_code"])
+        lines.product_id.product_tmpl_id.fetch(["name", "size_marla"])
+
+        plot_sizes = defaultdict(list)
+        plot_names = defaultdict(list)
+        for line in lines:
+            if line.product_id:
+                plot_names[line.order_id.id].append(line.product_id.name)
+            if line.product_id.size_marla:
+                plot_sizes[line.order_id.id].append(line.product_id.size_marla)
+
+        return {
+            "doc_ids": docs.ids,
+            "doc_model": "sale.order",
+            "docs": docs,
+            "data": data,
+            "plot_sizes": plot_sizes,
+            "plot_names": {order_id: ", ".join(names) for order_id, names in plot_names.items()},
+            "installment_rows": self._get_installment_rows(docs),
+            "paid_amounts": self._get_paid_amounts(docs),
+        }
+
+    @api.model
+    def _get_paid_amounts(self, orders):
+        """Total of the posted customer invoices per order id, in one grouped query."""
+        if not orders:
+            return {}
+        groups = self.env["account.move"]._read_group(
+            [("sale_id", "in", orders.ids), ("move_type", "=", "out_invoice"), ("state", "=", "posted")],
+            ["sale_id"], ["amount_total:sum"],
+        )
+        return {order.id: amount for order, amount in groups}
+
+    @api.model
+    def _get_installment_rows(self, orders):
+        """Installment schedule per order id, with the label of each invoice's first line."""
+        schedule = orders._get_installment_schedule()
+        move_ids = [row["id"] for rows in schedule.values() for row in rows]
+        # label of the first invoice line of each move, in invoice_line_ids order
+        labels = {}
+        if move_ids:
+            for line in self.env["account.move.line"].search_read(
+                    [("move_id", "in", move_ids),
+                     ("display_type", "in", ["product", "line_section", "line_note"])],
+                    ["move_id", "name"], order="move_id, sequence, id"):
+                labels.setdefault(line["move_id"][0], line["name"])
+
+        for order_id, rows in schedule.items():
+            del rows[REPORT_INVOICE_LIMIT:]
+            for row in rows:
+                row["label"] = labels.get(row["id"])
+        return schedule
+
+
+class ReportInstallmentLetter(models.AbstractModel):
+    _name = "report.land_plot_manager.report_installment_letter"
+    _inherit = "land.sale.order.report"
+    _description = "Installment Letter Report"
+
+
+class ReportFinalFile(models.AbstractModel):
+    _name = "report.land_plot_manager.action_report_final_file_document"
+    _inherit = "land.sale.order.report"
+    _description = "Final File Report"
+
+
+class ReportFullPaymentAcknowledgement(models.AbstractModel):
+    _name = "report.land_plot_manager.report_full_payment_acknowledgement"
+    _inherit = "land.sale.order.report"
+    _description = "Full Payment Acknowledgement Report"
+
+
+class ReportInstallmentAcknowledgement(models.AbstractModel):
+    _name = "report.land_plot_manager.report_installment_acknowledgement"
+    _inherit = "land.sale.order.report"
+    _description = "Installment Acknowledgement Report"
+
+
+class ReportSaleUser(models.AbstractModel):
+    _name = "report.land_plot_manager.action_report_sale_user_document"
+    _inherit = "land.sale.order.report"
+    _description = "Plot Sale Report"